@@ -0,0 +1,129 @@
+"""
+Attachment Optimizer - Smaller Screenshot Attachments
+Crops full-page screenshots to the above-the-fold region, downscales and
+re-encodes them to fit a size budget. Encoded MIME parts are cached on disk
+so retries and resends skip the image work entirely.
+"""
+
+import io
+import os
+import json
+import base64
+import hashlib
+import threading
+from email import encoders
+from email.mime.image import MIMEImage
+
+from PIL import Image
+
+from config_email import EmailConfig, FilePaths
+
+# Quality steps tried before shrinking the image further
+QUALITY_STEPS = [85, 75, 65, 55, 45, 35]
+
+
+class AttachmentOptimizer:
+    """Builds (and caches) optimized screenshot attachments."""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or FilePaths.ATTACHMENT_CACHE_DIR
+        self.format = EmailConfig.SCREENSHOT_FORMAT.upper()
+        self.max_bytes = EmailConfig.SCREENSHOT_MAX_KB * 1024
+        self.key_memo = {}  # (path, mtime, size) -> cache key
+        self.lock = threading.Lock()
+
+    def _settings_signature(self):
+        """Settings that change the encoded output (part of the cache key)."""
+        return (
+            f"{self.format}|{EmailConfig.SCREENSHOT_MAX_WIDTH}|"
+            f"{EmailConfig.SCREENSHOT_FOLD_HEIGHT}|{self.max_bytes}"
+        )
+
+    def _cache_key(self, path):
+        """Cache key from the file's content hash, mtime and our settings."""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            if memo_key in self.key_memo:
+                return self.key_memo[memo_key]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(f"|{stat.st_mtime_ns}|{self._settings_signature()}".encode())
+
+        key = digest.hexdigest()
+        with self.lock:
+            self.key_memo[memo_key] = key
+        return key
+
+    def _encode(self, image, quality):
+        """Encode an image at the given quality and return the bytes."""
+        buffer = io.BytesIO()
+        if self.format == 'WEBP':
+            image.save(buffer, 'WEBP', quality=quality, method=4)
+        else:
+            image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue()
+
+    def optimize(self, path):
+        """Crop, downscale and re-encode a screenshot to fit the size budget."""
+        with Image.open(path) as img:
+            img = img.convert('RGB')
+
+            # Scale to the target width, then keep only the above-the-fold part
+            scale = min(1.0, EmailConfig.SCREENSHOT_MAX_WIDTH / img.width)
+            fold_height = int(EmailConfig.SCREENSHOT_FOLD_HEIGHT / scale)
+            img = img.crop((0, 0, img.width, min(img.height, fold_height)))
+
+            if scale < 1.0:
+                size = (round(img.width * scale), max(1, round(img.height * scale)))
+                img = img.resize(size, Image.LANCZOS)
+
+            while True:
+                for quality in QUALITY_STEPS:
+                    data = self._encode(img, quality)
+                    if len(data) <= self.max_bytes:
+                        return data
+
+                # Still too big at the lowest quality - shrink and try again
+                if img.width < 200:
+                    return data
+                img = img.resize((img.width // 2, max(1, img.height // 2)), Image.LANCZOS)
+
+    def _build_part(self, subtype, filename, payload):
+        """Create a MIMEImage from an already base64-encoded payload."""
+        part = MIMEImage(b'', _subtype=subtype, _encoder=encoders.encode_noop, name=filename)
+        part.set_payload(payload)
+        part['Content-Transfer-Encoding'] = 'base64'
+        return part
+
+    def get_part(self, path):
+        """Return a ready-to-attach MIMEImage for a screenshot."""
+        key = self._cache_key(path)
+        cache_path = os.path.join(self.cache_dir, f"{key}.json")
+
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    cached = json.load(f)
+                return self._build_part(cached['subtype'], cached['filename'], cached['payload'])
+            except (ValueError, KeyError, OSError):
+                pass  # Corrupt cache entry - rebuild it below
+
+        data = self.optimize(path)
+        subtype = 'webp' if self.format == 'WEBP' else 'jpeg'
+        extension = '.webp' if subtype == 'webp' else '.jpg'
+        filename = os.path.splitext(os.path.basename(path))[0] + extension
+        payload = base64.encodebytes(data).decode('ascii')
+
+        # Write atomically - several render threads may share the cache
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'subtype': subtype, 'filename': filename, 'payload': payload}, f)
+        os.replace(tmp_path, cache_path)
+
+        return self._build_part(subtype, filename, payload)
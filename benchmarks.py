@@ -0,0 +1,473 @@
+"""
+Benchmarks - Performance Checks for the Email Pipeline
+Runs against synthetic data in a temp directory; never touches leads.csv.
+
+Usage:
+    python benchmarks.py lead_selection [--rows 500000]
+    python benchmarks.py followup_eligibility [--rows 100000]
+    python benchmarks.py followup_render [--rows 20000]
+    python benchmarks.py classify_responses [--rows 10000]
+    python benchmarks.py lead_index [--rows 1000000]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import base64
+import tempfile
+from collections import Counter
+from datetime import datetime, date
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import numpy as np
+import pandas as pd
+from colorama import init, Fore
+
+from config_email import EmailConfig, EmailTemplates, FollowUpConfig, ResponseConfig, CSVColumns
+from sendable_index import SendableIndex, sendable_mask
+from followup_calendar import FollowUpCalendar, due_followups
+from message_templates import CompiledTemplate
+from response_classifier import KeywordClassifier
+from lead_dedup import DUPLICATE
+from response_tracker import lead_address_index
+
+# Initialize colorama
+init(autoreset=True)
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def timed(label, func, repeat=3):
+    """Run func `repeat` times, print the best time and return its result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"  {label:<45} {best * 1000:>10.1f} ms")
+    return result
+
+
+def make_synthetic_leads(rows, seed=42):
+    """Build a leads DataFrame shaped like agency_bot.py output plus tracking columns."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows)
+
+    tiers = np.array(["HOT", "WARM", "COLD", "MANUAL_REVIEW"])
+    has_email = rng.random(rows) > 0.15
+    sent = rng.random(rows) < 0.4
+    sent_dates = pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 60, rows), unit="D")
+
+    return pd.DataFrame({
+        "Timestamp": (pd.Timestamp("2025-12-01") + pd.to_timedelta(ids, unit="s")).astype(str),
+        CSVColumns.BUSINESS_NAME: [f"Business {i}" for i in ids],
+        CSVColumns.URL: [f"https://www.business{i}.com/" for i in ids],
+        CSVColumns.TIER: tiers[rng.integers(0, len(tiers), rows)],
+        CSVColumns.EMAIL: np.where(has_email, [f"info@business{i}.com" for i in ids], ""),
+        CSVColumns.DESIGN_SCORE: rng.integers(1, 11, rows),
+        CSVColumns.DRAFT_HOOK: "Your site isn't mobile friendly.",
+        CSVColumns.EMAIL_SENT: sent,
+        CSVColumns.DATE_SENT: np.where(sent, sent_dates.strftime("%Y-%m-%d"), ""),
+        CSVColumns.SEND_STATUS: np.where(sent, "Success", ""),
+        CSVColumns.FOLLOWUP_1_SENT: "",
+        CSVColumns.FOLLOWUP_2_SENT: "",
+        CSVColumns.FOLLOWUP_3_SENT: "",
+        CSVColumns.RESPONSE: "",
+        CSVColumns.STATUS: np.where(rng.random(rows) < 0.02, "Unsubscribed", "Active"),
+    })
+
+
+# ============================================================================
+# LEAD SELECTION
+# ============================================================================
+
+def legacy_filter_leads_to_send(df, limit):
+    """The original chained-filter implementation of filter_leads_to_send."""
+    df_filtered = df[df[CSVColumns.TIER].isin(EmailConfig.SEND_TO_TIERS)]
+    df_filtered = df_filtered[df_filtered[CSVColumns.EMAIL_SENT] != True]
+    df_filtered = df_filtered[df_filtered[CSVColumns.EMAIL].notna()]
+    df_filtered = df_filtered[df_filtered[CSVColumns.EMAIL] != '']
+    df_filtered = df_filtered[df_filtered[CSVColumns.STATUS] != 'Unsubscribed']
+    already_sent = len(df[df[CSVColumns.EMAIL_SENT] == True])
+    return df_filtered.head(limit), already_sent
+
+
+def bench_lead_selection(rows):
+    """Compare lead selection strategies on a synthetic leads.csv."""
+    limit = EmailConfig.MAX_DAILY_SENDS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "leads.csv")
+        index_path = os.path.join(tmp, "sendable_index.json")
+
+        make_synthetic_leads(rows).to_csv(csv_path, index=False)
+        df = pd.read_csv(csv_path)
+        print(f"{Fore.CYAN}📊 Lead selection on {rows:,} synthetic leads (daily limit {limit})\n")
+
+        legacy, _ = timed("Chained filters (original)",
+                          lambda: legacy_filter_leads_to_send(df, limit))
+
+        def single_mask():
+            mask = sendable_mask(df)
+            already_sent = int((df[CSVColumns.EMAIL_SENT] == True).sum())
+            return df[mask].head(limit), already_sent
+
+        vectorized, _ = timed("Single combined mask", single_mask)
+        assert list(legacy.index) == list(vectorized.index)
+
+        def cold_index():
+            index = SendableIndex(index_path)
+            index.rebuild(df)
+            index.save()
+            return index
+
+        timed("Sendable index: full build + save", cold_index, repeat=1)
+
+        # Simulate a later run: a day of new leads appended to the CSV
+        new_rows = make_synthetic_leads(1000, seed=7)
+        new_rows[CSVColumns.EMAIL_SENT] = False
+        df_grown = pd.concat([df, new_rows], ignore_index=True)
+
+        def warm_index():
+            index = SendableIndex(index_path).load(df_grown)
+            taken = index.take(df_grown, limit)
+            index.restore(df_grown, taken)
+            return taken
+
+        taken = timed("Sendable index: load + 1k new rows + take", warm_index)
+        assert len(taken) == limit
+
+        def warm_index_no_growth():
+            index = SendableIndex(index_path).load(df)
+            taken = index.take(df, limit)
+            index.restore(df, taken)
+            return taken
+
+        timed("Sendable index: load + take", warm_index_no_growth)
+
+
+# ============================================================================
+# FOLLOW-UP ELIGIBILITY
+# ============================================================================
+
+def legacy_days_since(date_str):
+    """The original per-row strptime date math from FollowUpSender."""
+    if pd.isna(date_str) or not date_str:
+        return None
+    try:
+        date_obj = datetime.strptime(str(date_str), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+    return (date.today() - date_obj).days
+
+
+def legacy_filter_leads_for_followup(df, followup_number):
+    """The original iterrows() implementation of filter_leads_for_followup."""
+    df_filtered = df[df[CSVColumns.EMAIL_SENT] == True]
+    df_filtered = df_filtered[df_filtered[CSVColumns.DATE_SENT].notna()]
+    df_filtered = df_filtered[df_filtered[CSVColumns.DATE_SENT] != '']
+    df_filtered = df_filtered[
+        (df_filtered[CSVColumns.RESPONSE].isna()) |
+        (df_filtered[CSVColumns.RESPONSE] == '')
+    ]
+    df_filtered = df_filtered[df_filtered[CSVColumns.STATUS] != 'Unsubscribed']
+
+    thresholds = {
+        1: FollowUpConfig.FIRST_FOLLOWUP_DAYS,
+        2: FollowUpConfig.SECOND_FOLLOWUP_DAYS,
+        3: FollowUpConfig.THIRD_FOLLOWUP_DAYS
+    }
+    columns = {
+        1: CSVColumns.FOLLOWUP_1_SENT,
+        2: CSVColumns.FOLLOWUP_2_SENT,
+        3: CSVColumns.FOLLOWUP_3_SENT
+    }
+
+    leads_ready = []
+    for idx, lead in df_filtered.iterrows():
+        days_elapsed = legacy_days_since(lead[CSVColumns.DATE_SENT])
+        if days_elapsed is None or days_elapsed < thresholds[followup_number]:
+            continue
+
+        this_sent = lead[columns[followup_number]]
+        if pd.notna(this_sent) and this_sent:
+            continue
+
+        if followup_number > 1:
+            previous = lead[columns[followup_number - 1]]
+            if pd.isna(previous) or not previous:
+                continue
+
+        leads_ready.append(idx)
+
+    return df.loc[leads_ready]
+
+
+def bench_followup_eligibility(rows):
+    """Compare per-stage iterrows() passes with the single vectorized schedule."""
+    df = make_synthetic_leads(rows)
+
+    # Spread leads over the sequence: some already had follow-ups 1 and 2
+    rng = np.random.default_rng(3)
+    had_first = df[CSVColumns.EMAIL_SENT].to_numpy() & (rng.random(rows) < 0.5)
+    had_second = had_first & (rng.random(rows) < 0.5)
+    df[CSVColumns.FOLLOWUP_1_SENT] = np.where(had_first, "2026-03-10", "")
+    df[CSVColumns.FOLLOWUP_2_SENT] = np.where(had_second, "2026-03-20", "")
+
+    stages = range(1, FollowUpConfig.MAX_FOLLOWUPS + 1)
+    print(f"{Fore.CYAN}📊 Follow-up eligibility on {rows:,} synthetic leads "
+          f"({len(stages)} follow-up stages)\n")
+
+    legacy = timed("iterrows() pass per stage (original)",
+                   lambda: {n: legacy_filter_leads_for_followup(df, n) for n in stages},
+                   repeat=1)
+
+    # The original counted calendar days; compare like with like
+    skip_weekends = FollowUpConfig.SKIP_WEEKENDS
+    FollowUpConfig.SKIP_WEEKENDS = False
+    try:
+        vectorized = timed("Single vectorized schedule", lambda: due_followups(df))
+    finally:
+        FollowUpConfig.SKIP_WEEKENDS = skip_weekends
+
+    for number in stages:
+        assert list(legacy[number].index) == list(vectorized[number].index), number
+
+    FollowUpConfig.SKIP_WEEKENDS = True
+    try:
+        vectorized = timed("Single vectorized schedule (business days)", lambda: due_followups(df))
+    finally:
+        FollowUpConfig.SKIP_WEEKENDS = skip_weekends
+
+    with tempfile.TemporaryDirectory() as tmp:
+        calendar = FollowUpCalendar(os.path.join(tmp, "followup_calendar.db"))
+        timed("Follow-up calendar: full build", lambda: calendar.rebuild(df), repeat=1)
+        from_calendar = timed("Follow-up calendar: read + check due entries", lambda: calendar.due(df))
+        calendar._connection().close()
+
+    expected = due_followups(df)  # With the configured day counting
+    for number in stages:
+        assert sorted(from_calendar[number].index) == list(expected[number].index), number
+        print(f"  Follow-Up #{number}: {len(expected[number]):,} due")
+
+
+# ============================================================================
+# FOLLOW-UP RENDERING
+# ============================================================================
+
+def legacy_followup_message(business_name, to_email):
+    """The original per-lead MIMEMultipart build of follow-up #1."""
+    message = MIMEMultipart()
+    message['to'] = to_email
+    message['from'] = EmailConfig.YOUR_EMAIL
+    message['subject'] = EmailTemplates.FOLLOWUP_1_SUBJECT.format(business_name=business_name)
+    message.attach(MIMEText(EmailTemplates.FOLLOWUP_1_BODY.format(
+        business_name=business_name,
+        your_name=EmailConfig.YOUR_NAME,
+        your_phone=EmailConfig.YOUR_PHONE
+    ), 'plain'))
+    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')}
+
+
+def bench_followup_render(rows):
+    """Compare full MIME builds with the compiled follow-up template."""
+    leads = [(f"Business {i}", f"info@business{i}.com") for i in range(rows)]
+    print(f"{Fore.CYAN}📊 Rendering follow-up #1 for {rows:,} leads\n")
+
+    timed("MIMEMultipart build per lead (original)",
+          lambda: [legacy_followup_message(name, email) for name, email in leads], repeat=1)
+
+    template = CompiledTemplate(
+        EmailTemplates.FOLLOWUP_1_SUBJECT, EmailTemplates.FOLLOWUP_1_BODY,
+        your_name=EmailConfig.YOUR_NAME, your_phone=EmailConfig.YOUR_PHONE
+    )
+    rendered = timed("Compiled template",
+                     lambda: [template.render(email, EmailConfig.YOUR_EMAIL, name) for name, email in leads])
+
+    # Same bytes as a full build with the message's boundary
+    name, email = leads[-1]
+    raw = base64.urlsafe_b64decode(rendered[-1]['raw'])
+    boundary = re.search(rb'boundary="([^"]+)"', raw).group(1).decode()
+    assert raw == template._build(email, EmailConfig.YOUR_EMAIL, name, boundary=boundary)
+
+
+# ============================================================================
+# RESPONSE CLASSIFICATION
+# ============================================================================
+
+def legacy_classify_response(body_text, positive_keywords=None, negative_keywords=None):
+    """The original substring scan over each keyword list."""
+    if not body_text:
+        return "MAYBE"
+
+    body_lower = body_text.lower()
+    for keyword in ResponseConfig.IGNORE_KEYWORDS:
+        if keyword in body_lower:
+            return "IGNORE"
+
+    positive_score = sum(1 for keyword in positive_keywords or ResponseConfig.POSITIVE_KEYWORDS
+                         if keyword in body_lower)
+    negative_score = sum(1 for keyword in negative_keywords or ResponseConfig.NEGATIVE_KEYWORDS
+                         if keyword in body_lower)
+
+    if positive_score > negative_score:
+        return "YES"
+    elif negative_score > positive_score:
+        return "NO"
+    else:
+        return "MAYBE"
+
+
+def make_synthetic_replies(rows, seed=42):
+    """Reply bodies mixing keyword phrases, look-alike words and quoted text."""
+    rng = np.random.default_rng(seed)
+    phrases = (
+        ResponseConfig.POSITIVE_KEYWORDS + ResponseConfig.NEGATIVE_KEYWORDS
+        + ResponseConfig.IGNORE_KEYWORDS[:2]
+    )
+    filler = (
+        "thanks for reaching out about the website we book most jobs through "
+        "referrals and our token budget for marketing this quarter is small "
+        "the current site was built years ago by a friend of the owner"
+    ).split()
+
+    replies = []
+    for _ in range(rows):
+        words = list(rng.choice(filler, rng.integers(20, 120)))
+        for phrase in rng.choice(phrases, rng.integers(0, 4)):
+            words.insert(int(rng.integers(0, len(words) + 1)), phrase)
+        body = " ".join(words).capitalize() + "."
+        if rng.random() < 0.5:
+            body += "\n\n> On Monday you wrote:\n> " + EmailTemplates.FOLLOWUP_1_BODY[:400]
+        replies.append(body)
+    return replies
+
+
+# Replies the substring scan got wrong, and what the compiled classifier says
+CLASSIFIER_CHECKS = [
+    ("We book most jobs through referrals.", "MAYBE"),  # "ok" inside "book"
+    ("Not interested, thanks.", "NO"),  # Not also "interested"
+    ("No\nthank you", "NO"),  # Wrapped over two lines
+    ("(Yes) - call me!", "YES"),
+    ("Okay, send it over", "YES"),
+    ("I don’t think so - don’t contact me again", "NO"),  # Curly apostrophes
+    ("Automatic reply: I'm on vacation", "IGNORE"),
+]
+
+
+def bench_classify_responses(rows):
+    """Compare per-keyword substring scans with the compiled word-boundary regex."""
+    replies = make_synthetic_replies(rows)
+    print(f"{Fore.CYAN}📊 Classifying {rows:,} synthetic replies\n")
+
+    legacy = timed("Substring scan per keyword (original)",
+                   lambda: [legacy_classify_response(body) for body in replies])
+
+    timed("Compile keyword regex", lambda: KeywordClassifier(
+        ResponseConfig.IGNORE_KEYWORDS, ResponseConfig.POSITIVE_KEYWORDS, ResponseConfig.NEGATIVE_KEYWORDS
+    ))
+    classifier = KeywordClassifier(
+        ResponseConfig.IGNORE_KEYWORDS, ResponseConfig.POSITIVE_KEYWORDS, ResponseConfig.NEGATIVE_KEYWORDS
+    )
+    compiled = timed("Compiled classifier, classify_all", lambda: classifier.classify_all(replies))
+
+    for body, expected in CLASSIFIER_CHECKS:
+        assert classifier.classify(body) == expected, (body, classifier.classify(body), expected)
+
+    # Differences are substring false hits ("ok" in "book") and overlapping phrases
+    changes = Counter((old, new) for old, new in zip(legacy, compiled) if old != new)
+    changed = sum(changes.values())
+    print(f"  Classified differently: {changed:,} ({changed / max(rows, 1):.1%})")
+    for (old, new), count in changes.most_common():
+        print(f"    {old:>6} -> {new:<6} {count:>8,}")
+
+    # Substring scans grow with every keyword added; the compiled regex barely does
+    positive = ResponseConfig.POSITIVE_KEYWORDS + [
+        f"{keyword} {word}" for keyword in ResponseConfig.POSITIVE_KEYWORDS
+        for word in ("now", "today", "soon", "please", "asap", "this week")
+    ]
+    total = len(positive) + len(ResponseConfig.NEGATIVE_KEYWORDS) + len(ResponseConfig.IGNORE_KEYWORDS)
+    print(f"\n  With {total} keywords:")
+
+    timed("Substring scan per keyword (original)",
+          lambda: [legacy_classify_response(body, positive) for body in replies])
+    classifier = KeywordClassifier(
+        ResponseConfig.IGNORE_KEYWORDS, positive, ResponseConfig.NEGATIVE_KEYWORDS
+    )
+    timed("Compiled classifier, classify_all", lambda: classifier.classify_all(replies))
+
+
+# ============================================================================
+# REPLY SENDER INDEX
+# ============================================================================
+
+def legacy_lead_emails(df):
+    """The original iterrows() build of the tracker's email -> row index."""
+    lead_emails = {}
+    for idx, row in df.iterrows():
+        if row.get(CSVColumns.STATUS) == DUPLICATE:
+            continue
+        if pd.notna(row[CSVColumns.EMAIL]) and row[CSVColumns.EMAIL]:
+            lead_emails[row[CSVColumns.EMAIL].lower().strip()] = idx
+    return lead_emails
+
+
+def bench_lead_index(rows):
+    """Compare the iterrows() email index with the column-wise email + domain index."""
+    df = make_synthetic_leads(rows)
+    # A few leads on .co.uk domains, and a few with a free-mail address
+    uk = df.index % 50 == 1
+    df.loc[uk, CSVColumns.URL] = "https://www.shop" + df.index[uk].astype(str) + ".co.uk/"
+    free_mail = (df.index % 40 == 2) & (df[CSVColumns.EMAIL] != "")
+    df.loc[free_mail, CSVColumns.EMAIL] = "owner" + df.index[free_mail].astype(str) + "@gmail.com"
+    print(f"{Fore.CYAN}📊 Building reply sender indexes for {rows:,} leads\n")
+
+    legacy = timed("iterrows() email index (original)", lambda: legacy_lead_emails(df), repeat=1)
+    emails, domains = timed("Email + domain index",
+                            lambda: lead_address_index(df, {"gmail.com"}), repeat=1)
+
+    assert emails == legacy
+    print(f"  {len(emails):,} emails, {len(domains):,} domains")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+BENCHMARKS = {
+    "lead_selection": (bench_lead_selection, 500_000),
+    "followup_eligibility": (bench_followup_eligibility, 100_000),
+    "followup_render": (bench_followup_render, 20_000),
+    "classify_responses": (bench_classify_responses, 10_000),
+    "lead_index": (bench_lead_index, 1_000_000),
+}
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Email pipeline benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--rows", type=int, help="Override the default data size")
+    args = parser.parse_args()
+
+    names = sorted(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+    for name in names:
+        func, default_rows = BENCHMARKS[name]
+        print(f"{Fore.CYAN}{'='*70}")
+        func(args.rows or default_rows)
+        print()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}⚠️  Interrupted by user.")
+        sys.exit(0)
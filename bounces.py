@@ -0,0 +1,106 @@
+"""
+Bounces - Failed Recipients of Delivery Status Notifications
+Reads the addresses a bounce says could not be reached: the per-recipient
+blocks of a message/delivery-status part (RFC 3464) when the bounce has
+one, an X-Failed-Recipients header, or else the human-readable notice of
+common mail servers. Temporary failures (delays) are not bounces.
+"""
+
+import re
+
+from message_parts import walk_parts, decode_part, message_text
+
+# Status of leads whose address bounced
+BOUNCED = "Bounced"
+
+_BOUNCE_SENDER = re.compile(r'^(?:mailer-daemon|postmaster)@', re.IGNORECASE)
+_EMAIL = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+# Notice wording of permanent failures, and of delays that will be retried
+_PERMANENT = re.compile(
+    r"wasn't delivered|was not delivered|could(?:n't| not) be delivered|failed permanently"
+    r"|permanent (?:error|failure)|undeliverable|delivery has failed|address not found"
+    r"|does(?:n't| not) exist|user unknown|no such user|mailbox unavailable"
+    r"|recipient address rejected|\b5\.\d{1,3}\.\d{1,3}\b",
+    re.IGNORECASE
+)
+_TEMPORARY = re.compile(
+    r"delayed|temporar(?:y|ily)|will (?:retry|keep trying|continue trying)|\b4\.\d{1,3}\.\d{1,3}\b",
+    re.IGNORECASE
+)
+
+
+def _headers(payload):
+    return {header['name'].lower(): header['value'] for header in payload.get('headers', [])}
+
+
+def is_bounce_sender(from_email):
+    """True for the addresses mail servers send bounces from."""
+    return bool(from_email and _BOUNCE_SENDER.match(from_email))
+
+
+def is_bounce(message):
+    """True if a full Gmail message is a delivery status notification."""
+    payload = message.get('payload', {})
+    if payload.get('mimeType', '').lower() == 'multipart/report':
+        return True
+
+    sender = _EMAIL.search(_headers(payload).get('from', ''))
+    return bool(sender and is_bounce_sender(sender.group(0)))
+
+
+def _report_recipients(part):
+    """Recipients a message/delivery-status part marks as failed (None if it has no recipients)."""
+    recipients = None
+    # One block of fields for the message, then one per recipient
+    for block in re.split(r'\r?\n\s*\r?\n', decode_part(part)):
+        fields = {}
+        for line in block.splitlines():
+            name, _, value = line.partition(':')
+            fields[name.strip().lower()] = value.strip()
+
+        recipient = fields.get('final-recipient') or fields.get('original-recipient')
+        if not recipient:
+            continue
+
+        if recipients is None:
+            recipients = set()
+        action = fields.get('action', '').lower()
+        if action == 'failed' or (not action and fields.get('status', '').startswith('5')):
+            recipients.update(email.lower() for email in _EMAIL.findall(recipient))
+
+    return recipients
+
+
+def failed_recipients(message):
+    """Addresses a bounce reports as permanently undeliverable."""
+    payload = message.get('payload', {})
+
+    # Machine-readable reports are authoritative, including "delayed" ones
+    for part in walk_parts(payload):
+        if part.get('mimeType', '').lower() == 'message/delivery-status':
+            recipients = _report_recipients(part)
+            if recipients is not None:
+                return recipients
+
+    header = _headers(payload).get('x-failed-recipients')
+    if header:
+        return {email.lower() for email in _EMAIL.findall(header)}
+
+    # Otherwise go by the notice text
+    notice = message_text(payload)
+    if not _PERMANENT.search(notice) or _TEMPORARY.search(notice):
+        return set()
+    return {
+        email.lower() for email in _EMAIL.findall(notice)
+        if not is_bounce_sender(email)
+    }
+
+
+def bounced_recipients(messages):
+    """Every permanently failed address across a batch of full Gmail messages."""
+    recipients = set()
+    for message in messages:
+        if is_bounce(message):
+            recipients |= failed_recipients(message)
+    return recipients
@@ -23,17 +23,62 @@ class EmailConfig:
     CREDENTIALS_FILE = "credentials.json"  # Download from Google Cloud Console
     TOKEN_FILE = "token.json"  # Auto-generated after first auth
     
+    # Sending Accounts - leave empty to send only from YOUR_EMAIL / TOKEN_FILE.
+    # Each account gets its own token file, daily limit and send rate, e.g.:
+    # {"email": "you@gmail.com", "token_file": "token.json",
+    #  "max_daily_sends": 50, "sends_per_minute": 20}
+    SENDER_ACCOUNTS = []
+    
     # Sending Limits (Be Conservative!)
     MAX_DAILY_SENDS = 50  # Don't exceed 100 for new Gmail accounts
-    DELAY_BETWEEN_SENDS = 10  # Seconds between each email
+    SENDS_PER_MINUTE = 20  # Token-bucket pacing for batched sends
+    SEND_BATCH_SIZE = 10  # Messages per Gmail batch request (Gmail allows up to 100)
+    QUOTA_RESERVE_BLOCK = 10  # Sends each worker reserves from the quota ledger at a time
+    RENDER_WORKERS = 4  # Threads rendering/encoding messages ahead of the sender
+    RENDER_QUEUE_DEPTH = 20  # Max rendered messages waiting to be sent
+    JOURNAL_COMPACT_SIZE_KB = 512  # Fold send journal into leads.csv past this size
+    
+    # Retries (rate limits and temporary Gmail/network errors)
+    RETRY_MAX_ATTEMPTS = 5  # Backoff attempts per batch, and retries per parked email
+    RETRY_BASE_SECONDS = 2  # Exponential backoff base (jittered)
+    RETRY_MAX_WAIT_SECONDS = 300  # Longest single backoff (Retry-After can exceed it)
+    CIRCUIT_FAILURE_THRESHOLD = 3  # Failed batches in a row before pausing sends
+    CIRCUIT_COOLDOWN_SECONDS = 120  # Pause before a trial batch
+    CIRCUIT_MAX_TRIPS = 2  # Pauses per run before leaving the rest for next time
+    
+    # Daily Send Plan (send_scheduler.py) - percent of each account's daily
+    # limit set aside for each kind of email, planned in this order. A kind
+    # that can't use its share carries it forward to the others.
+    SEND_PLAN_WEIGHTS = {"followup": 40, "initial": 60}
     
     # Attachments
     ATTACH_SCREENSHOTS = True  # Attach website screenshots to emails
     MAX_ATTACHMENT_SIZE_MB = 10  # Gmail limit is 25MB, we use 10MB to be safe
+    OPTIMIZE_SCREENSHOTS = True  # Crop/downscale/re-encode screenshots before attaching
+    SCREENSHOT_FORMAT = "JPEG"  # JPEG or WEBP
+    SCREENSHOT_MAX_WIDTH = 1280  # Downscale wider screenshots to this width (px)
+    SCREENSHOT_FOLD_HEIGHT = 900  # Keep only the top of the page (px, after scaling)
+    SCREENSHOT_MAX_KB = 300  # Size budget per attachment
     
     # Lead Filtering
     SEND_TO_TIERS = ["HOT", "WARM"]  # Only send to these tier levels
     SKIP_MANUAL_REVIEW = True  # Don't send to MANUAL_REVIEW tier
+    SUPPRESSED_STATUSES = ["Unsubscribed", "Bounced"]  # Never emailed again
+    
+    # Send Priority - tiers in SEND_TO_TIERS order, then lowest Design_Score
+    # (the most outdated sites), then by when the lead was found
+    SEND_NEWEST_LEADS_FIRST = True  # False = oldest leads first
+    
+    # Duplicate Leads - rows matching an earlier lead on any of these are merged
+    # ("name" is also available, but unrelated businesses in different cities
+    # often share a name)
+    DEDUP_KEYS = ["email", "domain"]
+    # Hosts shared by many businesses - their domain says nothing about identity
+    DEDUP_SHARED_DOMAINS = [
+        "facebook.com", "instagram.com", "yelp.com", "google.com", "linktr.ee",
+        "wixsite.com", "squarespace.com", "godaddysites.com", "business.site",
+        "weebly.com", "wordpress.com", "square.site", "yellowpages.com"
+    ]
 
 
 # ============================================================================
@@ -51,7 +96,9 @@ class FollowUpConfig:
     MAX_FOLLOWUPS = 2  # Set to 2 for gentle approach (3 total emails)
     
     # Skip weekends? (Professional practice)
-    SKIP_WEEKENDS = True  # Don't send on Saturday/Sunday
+    SKIP_WEEKENDS = True  # Don't send on Saturday/Sunday; the days above count business days
+    THREAD_FOLLOWUPS = True  # Send follow-ups as replies in the first email's thread
+    HOLIDAYS_FILE = "holidays.txt"  # Optional: one YYYY-MM-DD per line, skipped like weekends
 
 
 # ============================================================================
@@ -173,6 +220,24 @@ class ResponseConfig:
         'out of office', 'away from', 'automatic reply', 'auto-reply',
         'vacation', 'delivery failed', 'undeliverable', 'mailer-daemon'
     ]
+    
+    # Threads of leads contacted within this many days are checked for replies
+    THREAD_LOOKBACK_DAYS = 30
+    INBOX_SCAN_DAYS = 14  # Full inbox scan (first run, or when the sync point expired)
+    FETCH_BATCH_SIZE = 100  # Messages fetched per Gmail batch request (Gmail allows up to 100)
+    SEARCH_QUERY_MAX_CHARS = 1500  # Longest from:(a OR b ...) search sent to Gmail
+    BODY_MAX_BYTES = 8192  # Start of a reply that's decoded and classified
+    HTML_MAX_BYTES = 262144  # Raw HTML decoded for an HTML-only reply (its text is then cut to BODY_MAX_BYTES)
+    MESSAGE_CACHE_DAYS = 30  # Processed message ids are remembered this long (> INBOX_SCAN_DAYS)
+    
+    # A reply from another address at a lead's own domain (owner@ when we
+    # emailed info@) counts as the lead's reply - except on these shared hosts
+    FREE_MAIL_DOMAINS = [
+        "gmail.com", "googlemail.com", "yahoo.com", "ymail.com", "hotmail.com",
+        "outlook.com", "live.com", "msn.com", "aol.com", "icloud.com", "me.com",
+        "mac.com", "comcast.net", "att.net", "sbcglobal.net", "verizon.net",
+        "protonmail.com", "proton.me", "gmx.com", "mail.com", "zoho.com", "yandex.com"
+    ]
 
 
 # ============================================================================
@@ -183,6 +248,7 @@ class CSVColumns:
     """Column names for tracking in leads.csv."""
     
     # Original columns from agency_bot.py
+    TIMESTAMP = "Timestamp"
     BUSINESS_NAME = "Business_Name"
     URL = "URL"
     TIER = "Tier"
@@ -207,7 +273,12 @@ class CSVColumns:
     RESPONSE_DATE = "Response_Date"
     RESPONSE_TEXT = "Response_Text"  # First 100 chars of reply
     
-    STATUS = "Status"  # Active/Responded/Dead/Unsubscribed
+    STATUS = "Status"  # Active/Responded/Dead/Unsubscribed/Bounced/Duplicate
+    
+    SENDER_ACCOUNT = "Sender_Account"  # Mailbox that first contacted this lead
+    GMAIL_MESSAGE_ID = "Gmail_Message_ID"  # Gmail id of the latest email we sent
+    GMAIL_THREAD_ID = "Gmail_Thread_ID"  # Gmail thread of the conversation
+    THREAD_MESSAGE_IDS = "Thread_Message_IDs"  # Message-ID headers we sent, oldest first
 
 
 # ============================================================================
@@ -220,7 +291,15 @@ class FilePaths:
     LEADS_CSV = "leads.csv"
     SCREENSHOT_DIR = "scans"
     LOG_FILE = "email_automation.log"
-    SENT_TRACKER = "sent_emails_today.txt"  # Track daily send count
+    QUOTA_DB = "quota_ledger.db"  # Daily send counts per account and message type
+    RETRY_QUEUE_DB = "retry_queue.db"  # Rendered emails waiting to be retried
+    SEND_JOURNAL = "send_journal.jsonl"  # Send results not yet folded into leads.csv
+    ATTACHMENT_CACHE_DIR = ".attachment_cache"  # Encoded screenshot parts
+    SENDABLE_INDEX = "sendable_index.json"  # Priority queue of leads awaiting first contact
+    DEDUP_INDEX = "dedup_index.json"  # Identity keys of leads already checked for duplicates
+    FOLLOWUP_DB = "followup_calendar.db"  # Next follow-up of each lead, by due date
+    INBOX_SYNC_STATE = "inbox_sync.json"  # Last Gmail history id synced per mailbox
+    MESSAGE_CACHE_DB = "processed_messages.db"  # Inbox messages the tracker already handled
 
 
 # ============================================================================
@@ -5,19 +5,24 @@ Reads leads.csv and sends personalized emails to qualified leads.
 
 import os
 import sys
-import time
 import base64
 import pandas as pd
-from datetime import datetime, date
+from datetime import datetime
 from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 
-from googleapiclient.errors import HttpError
 from colorama import init, Fore, Style
 
-from gmail_auth_helper import GmailAuthenticator
+from sender_pool import SenderPool
+from send_journal import SendJournal
+from message_pipeline import RenderPipeline
+from attachment_optimizer import AttachmentOptimizer
+from message_templates import new_message_id
+from sendable_index import SendableIndex, sendable_mask, RETRY_PENDING
+from lead_dedup import DedupIndex
+from followup_calendar import FollowUpCalendar
 from config_email import (
     EmailConfig, EmailTemplates, CSVColumns, FilePaths,
     TestConfig, LogConfig, get_niche_from_query, get_city_from_query
@@ -31,38 +36,24 @@ class EmailSender:
     """Handles sending initial contact emails to leads."""
     
     def __init__(self):
-        self.authenticator = GmailAuthenticator()
+        self.pool = SenderPool()
         self.service = None
-        self.emails_sent_today = 0
-        self.load_daily_count()
+        self.journal = SendJournal()
+        self.attachments = AttachmentOptimizer()
+        self.index = SendableIndex()
+        self.dedup = DedupIndex()
+        self.calendar = FollowUpCalendar()
     
-    def load_daily_count(self):
-        """Load today's send count from file."""
-        if os.path.exists(FilePaths.SENT_TRACKER):
-            try:
-                with open(FilePaths.SENT_TRACKER, 'r') as f:
-                    data = f.read().strip().split('|')
-                    if len(data) == 2:
-                        saved_date, count = data
-                        if saved_date == str(date.today()):
-                            self.emails_sent_today = int(count)
-                        else:
-                            # New day, reset counter
-                            self.emails_sent_today = 0
-            except:
-                self.emails_sent_today = 0
-    
-    def save_daily_count(self):
-        """Save today's send count to file."""
-        with open(FilePaths.SENT_TRACKER, 'w') as f:
-            f.write(f"{date.today()}|{self.emails_sent_today}")
+    @property
+    def emails_sent_today(self):
+        return self.pool.emails_sent_today
     
     def connect(self):
-        """Connect to Gmail API."""
+        """Connect every sending account to Gmail API."""
         print(f"{Fore.CYAN}🔐 Connecting to Gmail API...")
-        self.service = self.authenticator.get_service()
         
-        if self.service:
+        if self.pool.connect():
+            self.service = self.pool.default.service
             print(f"{Fore.GREEN}✅ Connected successfully!")
             return True
         else:
@@ -89,53 +80,60 @@ class EmailSender:
             CSVColumns.RESPONSE: '',
             CSVColumns.RESPONSE_DATE: '',
             CSVColumns.RESPONSE_TEXT: '',
-            CSVColumns.STATUS: 'Active'
+            CSVColumns.STATUS: 'Active',
+            CSVColumns.SENDER_ACCOUNT: '',
+            CSVColumns.GMAIL_MESSAGE_ID: '',
+            CSVColumns.GMAIL_THREAD_ID: '',
+            CSVColumns.THREAD_MESSAGE_IDS: ''
         }
         
         for col, default_val in new_columns.items():
             if col not in df.columns:
                 df[col] = default_val
         
+        # Apply send results not yet folded into the CSV
+        df = self.journal.replay(df)
+        
+        # Merge leads scraped more than once (only new rows are hashed)
+        merged = self.dedup.merge_new_rows(df)
+        if merged:
+            print(f"{Fore.YELLOW}🔁 Merged {len(merged)} duplicate leads into earlier rows")
+        if self.dedup.restored:
+            print(f"{Fore.YELLOW}🔁 {len(self.dedup.restored)} leads are no longer duplicates under DEDUP_KEYS")
+        if merged or self.dedup.restored:
+            self.journal.compact(df)
+            self.calendar.refresh(df, self.dedup.changed_rows())
+        self.dedup.save()
+        
         return df
     
     def filter_leads_to_send(self, df):
-        """Filter leads that should receive emails."""
-        # Filter by tier
-        df_filtered = df[df[CSVColumns.TIER].isin(EmailConfig.SEND_TO_TIERS)]
-        
-        # Skip if already sent
-        df_filtered = df_filtered[df_filtered[CSVColumns.EMAIL_SENT] != True]
-        
-        # Must have email
-        df_filtered = df_filtered[df_filtered[CSVColumns.EMAIL].notna()]
-        df_filtered = df_filtered[df_filtered[CSVColumns.EMAIL] != '']
-        
-        # Skip if unsubscribed
-        df_filtered = df_filtered[df_filtered[CSVColumns.STATUS] != 'Unsubscribed']
+        """Pick today's leads from the persisted sendable index."""
+        # Index only rows appended since the last run
+        self.index.load(df)
+        self.index.refresh(df, self.dedup.changed_rows())
         
         print(f"\n{Fore.CYAN}📊 Lead Statistics:")
         print(f"  Total leads in CSV: {len(df)}")
-        print(f"  Qualified to send: {len(df_filtered)}")
-        print(f"  Already sent: {len(df[df[CSVColumns.EMAIL_SENT] == True])}")
-        print(f"  Emails sent today: {self.emails_sent_today}/{EmailConfig.MAX_DAILY_SENDS}")
+        print(f"  Qualified to send: {len(self.index)}")
+        print(f"  Already sent: {int((df[CSVColumns.EMAIL_SENT] == True).sum())}")
+        print(f"  Emails sent today: {self.emails_sent_today}/{self.pool.max_daily_sends}")
         
-        # Apply daily limit
-        remaining_today = EmailConfig.MAX_DAILY_SENDS - self.emails_sent_today
+        # Apply daily limit (summed over every connected account)
+        remaining_today = self.pool.remaining_today
         if remaining_today <= 0:
             print(f"{Fore.YELLOW}⚠️  Daily send limit reached!")
-            return df_filtered.iloc[0:0]  # Return empty dataframe
-        
-        df_filtered = df_filtered.head(remaining_today)
+            return df.iloc[0:0]  # Return empty dataframe
         
         if TestConfig.TEST_MODE:
             print(f"\n{Fore.YELLOW}⚠️  TEST MODE ENABLED")
             print(f"  Limiting to {TestConfig.TEST_LEAD_LIMIT} leads")
             print(f"  All emails will go to: {TestConfig.TEST_EMAIL}")
-            df_filtered = df_filtered.head(TestConfig.TEST_LEAD_LIMIT)
+            remaining_today = min(remaining_today, TestConfig.TEST_LEAD_LIMIT)
         
-        return df_filtered
+        return df.loc[self.index.take(df, remaining_today)]
     
-    def create_email_message(self, lead):
+    def create_email_message(self, lead, from_email=None):
         """Create email message for a lead."""
         # Get lead data
         business_name = lead[CSVColumns.BUSINESS_NAME]
@@ -166,8 +164,9 @@ class EmailSender:
         # Create message
         message = MIMEMultipart()
         message['to'] = to_email
-        message['from'] = EmailConfig.YOUR_EMAIL
+        message['from'] = from_email or EmailConfig.YOUR_EMAIL
         message['subject'] = subject
+        message['Message-ID'] = new_message_id(from_email or EmailConfig.YOUR_EMAIL)
         
         # Add body
         message.attach(MIMEText(body, 'plain'))
@@ -177,17 +176,21 @@ class EmailSender:
             screenshot_path = lead[CSVColumns.SCREENSHOT]
             if os.path.exists(screenshot_path):
                 try:
-                    # Check file size
-                    file_size_mb = os.path.getsize(screenshot_path) / (1024 * 1024)
-                    
-                    if file_size_mb <= EmailConfig.MAX_ATTACHMENT_SIZE_MB:
-                        with open(screenshot_path, 'rb') as f:
-                            img_data = f.read()
-                        
-                        image = MIMEImage(img_data, name=os.path.basename(screenshot_path))
-                        message.attach(image)
+                    if EmailConfig.OPTIMIZE_SCREENSHOTS:
+                        # Cropped, re-encoded and cached - always within budget
+                        message.attach(self.attachments.get_part(screenshot_path))
                     else:
-                        print(f"  {Fore.YELLOW}⚠️  Screenshot too large ({file_size_mb:.1f}MB), skipping attachment")
+                        # Check file size
+                        file_size_mb = os.path.getsize(screenshot_path) / (1024 * 1024)
+                        
+                        if file_size_mb <= EmailConfig.MAX_ATTACHMENT_SIZE_MB:
+                            with open(screenshot_path, 'rb') as f:
+                                img_data = f.read()
+                            
+                            image = MIMEImage(img_data, name=os.path.basename(screenshot_path))
+                            message.attach(image)
+                        else:
+                            print(f"  {Fore.YELLOW}⚠️  Screenshot too large ({file_size_mb:.1f}MB), skipping attachment")
                 
                 except Exception as e:
                     print(f"  {Fore.YELLOW}⚠️  Failed to attach screenshot: {e}")
@@ -197,27 +200,68 @@ class EmailSender:
         
         return {'raw': raw_message}
     
-    def send_email(self, message_body, lead_info):
-        """Send email via Gmail API."""
-        try:
-            message = self.service.users().messages().send(
-                userId='me',
-                body=message_body
-            ).execute()
+    def build_jobs(self, df, leads, account, counts):
+        """Yield (idx, message) pairs for `leads` as the render pipeline produces them."""
+        pipeline = RenderPipeline(lambda lead: self.create_email_message(lead, account.email))
+        
+        for idx, lead, message, error in pipeline.run(leads.iterrows()):
+            business_name = lead[CSVColumns.BUSINESS_NAME]
+            email = TestConfig.TEST_EMAIL if TestConfig.TEST_MODE else lead[CSVColumns.EMAIL]
+            
+            print(f"{Fore.CYAN}{'─'*70}")
+            print(f"{Fore.CYAN}📤 Sending to: {business_name} (via {account.email})")
+            print(f"{Fore.CYAN}📧 Email: {email}")
+            
+            if error is not None:
+                print(f"{Fore.RED}  ❌ Unexpected error: {error}")
+                with self.pool.lock:
+                    self.journal.record(df, idx, {CSVColumns.SEND_STATUS: f"Error: {str(error)[:50]}"})
+                    counts['fail'] += 1
+                continue
             
-            return True, message['id']
+            yield idx, message
+    
+    def record_result(self, df, account, idx, success, result, counts):
+        """Per-lead bookkeeping for one send result. Returns True if it was sent."""
+        business_name = df.loc[idx, CSVColumns.BUSINESS_NAME]
         
-        except HttpError as error:
-            error_msg = str(error)
+        if success:
+            print(f"{Fore.GREEN}  ✅ Sent to {business_name}! (ID: {result['id']})")
+            
+            # Schedule follow-up #1 before journaling: an entry for a send
+            # that never reached the journal is dropped when it comes due
+            self.calendar.record_sent(idx)
             
-            if 'quota' in error_msg.lower() or 'rate' in error_msg.lower():
-                print(f"  {Fore.RED}❌ Rate limit hit! Stopping for today.")
-                return False, "RATE_LIMIT"
+            # Journal the result and pin the lead to this account
+            self.journal.record(df, idx, {
+                CSVColumns.EMAIL_SENT: True,
+                CSVColumns.DATE_SENT: datetime.now().strftime("%Y-%m-%d"),
+                CSVColumns.SEND_STATUS: "Success",
+                CSVColumns.SENDER_ACCOUNT: account.email,
+                CSVColumns.GMAIL_MESSAGE_ID: result['id'],
+                CSVColumns.GMAIL_THREAD_ID: result.get('threadId', ''),
+                CSVColumns.THREAD_MESSAGE_IDS: result.get('message_id', '')
+            })
             
-            return False, error_msg
+            counts['success'] += 1
+            return True
+        
+        elif result.retryable:
+            # Parked in the retry queue - not a permanent failure
+            print(f"{Fore.YELLOW}  ⏸️  Will retry {business_name}: {str(result)[:80]}")
+            self.journal.record(df, idx, {CSVColumns.SEND_STATUS: RETRY_PENDING})
+        
+        else:
+            print(f"{Fore.RED}  ❌ Failed ({business_name}): {result}")
+            self.journal.record(df, idx, {CSVColumns.SEND_STATUS: f"Failed: {str(result)[:50]}"})
+            counts['fail'] += 1
         
-        except Exception as e:
-            return False, str(e)
+        return False
+    
+    def still_sendable(self, df, keys):
+        """The rows among parked initial emails that may still be sent."""
+        leads = df.loc[df.index.intersection(keys)]
+        return set(leads.index[sendable_mask(leads, parked=True)])
     
     def process_leads(self):
         """Main processing loop."""
@@ -229,11 +273,15 @@ class EmailSender:
         # Filter leads to send
         leads_to_send = self.filter_leads_to_send(df)
         
-        if len(leads_to_send) == 0:
+        parked = self.pool.retry_queue.pending(kind='initial')
+        
+        if len(leads_to_send) == 0 and not parked:
             print(f"\n{Fore.YELLOW}No leads to send emails to.")
             return
         
         print(f"\n{Fore.GREEN}📧 Ready to send {len(leads_to_send)} emails\n")
+        if parked:
+            print(f"{Fore.CYAN}🔁 {parked} parked emails will be retried first\n")
         
         if not TestConfig.TEST_MODE:
             confirm = input(f"{Fore.YELLOW}Continue? (yes/no): ").strip().lower()
@@ -241,71 +289,43 @@ class EmailSender:
                 print(f"{Fore.YELLOW}Cancelled by user.")
                 return
         
-        # Process each lead
-        success_count = 0
-        fail_count = 0
+        # Process leads in paced batches
+        counts = {'success': 0, 'fail': 0}
+        sent_rows = set()
         
-        for idx, lead in leads_to_send.iterrows():
-            business_name = lead[CSVColumns.BUSINESS_NAME]
-            email = TestConfig.TEST_EMAIL if TestConfig.TEST_MODE else lead[CSVColumns.EMAIL]
-            
-            print(f"{Fore.CYAN}{'─'*70}")
-            print(f"{Fore.CYAN}📤 Sending to: {business_name}")
-            print(f"{Fore.CYAN}📧 Email: {email}")
-            
-            try:
-                # Create message
-                message = self.create_email_message(lead)
-                
-                # Send
-                success, result = self.send_email(message, lead)
-                
-                if success:
-                    print(f"{Fore.GREEN}  ✅ Sent successfully! (ID: {result})")
-                    
-                    # Update CSV
-                    df.loc[idx, CSVColumns.EMAIL_SENT] = True
-                    df.loc[idx, CSVColumns.DATE_SENT] = datetime.now().strftime("%Y-%m-%d")
-                    df.loc[idx, CSVColumns.SEND_STATUS] = "Success"
-                    
-                    success_count += 1
-                    self.emails_sent_today += 1
-                    self.save_daily_count()
-                
-                else:
-                    if result == "RATE_LIMIT":
-                        # Stop immediately
-                        df.loc[idx, CSVColumns.SEND_STATUS] = "Rate Limited"
-                        fail_count += 1
-                        break
-                    else:
-                        print(f"{Fore.RED}  ❌ Failed: {result}")
-                        df.loc[idx, CSVColumns.SEND_STATUS] = f"Failed: {result[:50]}"
-                        fail_count += 1
-                
-                # Save progress after each email
-                df.to_csv(FilePaths.LEADS_CSV, index=False)
-                
-                # Rate limiting delay
-                if success and idx < len(leads_to_send) - 1:
-                    delay = EmailConfig.DELAY_BETWEEN_SENDS
-                    print(f"{Fore.CYAN}  ⏳ Waiting {delay} seconds...")
-                    time.sleep(delay)
-            
-            except KeyboardInterrupt:
-                print(f"\n{Fore.YELLOW}⚠️  Interrupted by user. Progress saved.")
-                df.to_csv(FilePaths.LEADS_CSV, index=False)
-                break
-            
-            except Exception as e:
-                print(f"{Fore.RED}  ❌ Unexpected error: {e}")
-                df.loc[idx, CSVColumns.SEND_STATUS] = f"Error: {str(e)[:50]}"
-                fail_count += 1
-                # Save and continue
-                df.to_csv(FilePaths.LEADS_CSV, index=False)
+        def record_result(account, idx, success, result):
+            if self.record_result(df, account, idx, success, result, counts):
+                sent_rows.add(idx)
+        
+        # Shard across accounts and send through all of them in parallel
+        shards = self.pool.shard(df, list(leads_to_send.index))
+        jobs_by_account = {
+            account: self.build_jobs(df, leads_to_send.loc[rows], account, counts)
+            for account, rows in shards.items()
+        }
+        
+        # Accounts with parked messages drain them even without new leads
+        for account in self.pool.accounts_with_retries('initial'):
+            jobs_by_account.setdefault(account, iter(()))
+        
+        try:
+            self.pool.send_parallel(
+                jobs_by_account, record_result,
+                eligible=lambda keys: self.still_sendable(df, keys)
+            )
+        
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}⚠️  Interrupted by user. Progress saved.")
+        
+        success_count = counts['success']
+        fail_count = counts['fail']
+        
+        # Final save - fold the journal into leads.csv
+        self.journal.compact(df)
         
-        # Final save
-        df.to_csv(FilePaths.LEADS_CSV, index=False)
+        # Leads we didn't get to stay queued for the next run
+        self.index.restore(df, [idx for idx in leads_to_send.index if idx not in sent_rows])
+        self.index.save()
         
         # Summary
         print(f"\n{Fore.CYAN}{'='*70}")
@@ -313,7 +333,8 @@ class EmailSender:
         print(f"{Fore.CYAN}{'='*70}")
         print(f"{Fore.GREEN}✅ Successfully sent: {success_count}")
         print(f"{Fore.RED}❌ Failed: {fail_count}")
-        print(f"{Fore.CYAN}📧 Total sent today: {self.emails_sent_today}/{EmailConfig.MAX_DAILY_SENDS}")
+        print(f"{Fore.YELLOW}⏸️  Parked for retry: {self.pool.retry_queue.pending(kind='initial')}")
+        print(f"{Fore.CYAN}📧 Total sent today: {self.emails_sent_today}/{self.pool.max_daily_sends}")
         print(f"{Fore.GREEN}✅ Progress saved to: {FilePaths.LEADS_CSV}\n")
 
 
@@ -5,17 +5,17 @@ Sends follow-up emails to non-responders based on timing rules.
 
 import os
 import sys
-import time
-import base64
 import pandas as pd
 from datetime import datetime, date, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from itertools import chain
 
-from googleapiclient.errors import HttpError
 from colorama import init, Fore
 
-from gmail_auth_helper import GmailAuthenticator
+from sender_pool import SenderPool
+from followup_calendar import FollowUpCalendar, FOLLOWUP_COLUMNS, followup_schedule, is_day_off
+from send_journal import SendJournal
+from lead_dedup import DUPLICATE
+from message_templates import CompiledTemplate, new_message_id
 from config_email import (
     EmailConfig, EmailTemplates, FollowUpConfig,
     CSVColumns, FilePaths, TestConfig, LogConfig
@@ -25,20 +25,32 @@ from config_email import (
 init(autoreset=True)
 
 
+def next_followup_number(lead):
+    """First follow-up a lead hasn't been sent yet."""
+    for number, col in enumerate(FOLLOWUP_COLUMNS, 1):
+        value = lead.get(col)
+        if pd.isna(value) or str(value).strip() == '':
+            return number
+    return len(FOLLOWUP_COLUMNS)
+
+
 class FollowUpSender:
     """Handles automated follow-up email sequence."""
     
     def __init__(self):
-        self.authenticator = GmailAuthenticator()
+        self.pool = SenderPool()
         self.service = None
+        self.journal = SendJournal()
+        self.calendar = FollowUpCalendar()
+        self.templates = {}  # (followup number, threaded) -> CompiledTemplate
         self.emails_sent_today = 0
     
     def connect(self):
         """Connect to Gmail API."""
         print(f"{Fore.CYAN}🔐 Connecting to Gmail API...")
-        self.service = self.authenticator.get_service()
         
-        if self.service:
+        if self.pool.connect():
+            self.service = self.pool.default.service
             print(f"{Fore.GREEN}✅ Connected successfully!")
             return True
         else:
@@ -53,253 +65,215 @@ class FollowUpSender:
         
         df = pd.read_csv(FilePaths.LEADS_CSV)
         
-        # Ensure follow-up columns exist
-        for col in [CSVColumns.FOLLOWUP_1_SENT, CSVColumns.FOLLOWUP_2_SENT, CSVColumns.FOLLOWUP_3_SENT]:
+        # Ensure follow-up, threading and tracking columns exist
+        for col in FOLLOWUP_COLUMNS + [
+            CSVColumns.GMAIL_MESSAGE_ID, CSVColumns.GMAIL_THREAD_ID, CSVColumns.THREAD_MESSAGE_IDS,
+            CSVColumns.SENDER_ACCOUNT, CSVColumns.RESPONSE
+        ]:
             if col not in df.columns:
                 df[col] = ''
+        if CSVColumns.STATUS not in df.columns:
+            df[CSVColumns.STATUS] = 'Active'
         
-        return df
+        # Apply send results not yet folded into the CSV
+        return self.journal.replay(df)
     
     def is_weekend(self):
-        """Check if today is weekend."""
-        if FollowUpConfig.SKIP_WEEKENDS:
-            return date.today().weekday() >= 5  # 5=Saturday, 6=Sunday
-        return False
+        """Check if today is a weekend or a holiday from HOLIDAYS_FILE."""
+        return is_day_off()
     
-    def parse_date(self, date_str):
-        """Parse date string to date object."""
-        if pd.isna(date_str) or not date_str:
-            return None
-        
-        try:
-            return datetime.strptime(str(date_str), "%Y-%m-%d").date()
-        except:
-            return None
+    def filter_leads_for_followups(self, df):
+        """Leads due for every follow-up, as {followup_number: leads}."""
+        # Only entries due today are read from the calendar
+        return self.calendar.load(df).due(df)
     
-    def days_since(self, date_str):
-        """Calculate days since a date."""
-        date_obj = self.parse_date(date_str)
-        if not date_obj:
-            return None
-        
-        return (date.today() - date_obj).days
+    def still_due(self, df, keys):
+        """The rows among parked follow-ups that are still due one."""
+        schedule = followup_schedule(df.loc[df.index.intersection(keys)])
+        is_due = (schedule['stage'] > 0) & (schedule['due'] <= pd.Timestamp(date.today()))
+        return set(schedule.index[is_due])
     
-    def filter_leads_for_followup(self, df, followup_number):
-        """Filter leads that need a specific follow-up."""
-        # Must have initial email sent
-        df_filtered = df[df[CSVColumns.EMAIL_SENT] == True]
-        
-        # Must have a date sent
-        df_filtered = df_filtered[df_filtered[CSVColumns.DATE_SENT].notna()]
-        df_filtered = df_filtered[df_filtered[CSVColumns.DATE_SENT] != '']
-        
-        # Must NOT have responded
-        df_filtered = df_filtered[
-            (df_filtered[CSVColumns.RESPONSE].isna()) | 
-            (df_filtered[CSVColumns.RESPONSE] == '')
-        ]
-        
-        # Must NOT be unsubscribed
-        df_filtered = df_filtered[df_filtered[CSVColumns.STATUS] != 'Unsubscribed']
-        
-        # Check timing and previous follow-ups
-        leads_ready = []
-        
-        for idx, lead in df_filtered.iterrows():
-            date_sent = lead[CSVColumns.DATE_SENT]
-            days_elapsed = self.days_since(date_sent)
-            
-            if days_elapsed is None:
-                continue
-            
-            # Check which follow-up to send
-            if followup_number == 1:
-                # First follow-up
-                if days_elapsed >= FollowUpConfig.FIRST_FOLLOWUP_DAYS:
-                    # Check if not already sent
-                    if pd.isna(lead[CSVColumns.FOLLOWUP_1_SENT]) or not lead[CSVColumns.FOLLOWUP_1_SENT]:
-                        leads_ready.append(idx)
+    def template_for(self, followup_number, threaded=False):
+        """Compiled template for a follow-up (built on first use)."""
+        key = (followup_number, threaded)
+        if key not in self.templates:
+            subject = getattr(EmailTemplates, f"FOLLOWUP_{followup_number}_SUBJECT", None)
+            body = getattr(EmailTemplates, f"FOLLOWUP_{followup_number}_BODY", None)
+            if subject is None or body is None:
+                return None
             
-            elif followup_number == 2:
-                # Second follow-up
-                if days_elapsed >= FollowUpConfig.SECOND_FOLLOWUP_DAYS:
-                    # Must have sent first follow-up
-                    if pd.notna(lead[CSVColumns.FOLLOWUP_1_SENT]) and lead[CSVColumns.FOLLOWUP_1_SENT]:
-                        # Check if not already sent second
-                        if pd.isna(lead[CSVColumns.FOLLOWUP_2_SENT]) or not lead[CSVColumns.FOLLOWUP_2_SENT]:
-                            leads_ready.append(idx)
+            headers = ['Message-ID']
+            if threaded:
+                # Replies keep the first email's subject so every client threads them
+                subject = "Re: " + EmailTemplates.INITIAL_SUBJECT
+                headers += ['In-Reply-To', 'References']
             
-            elif followup_number == 3:
-                # Third follow-up
-                if days_elapsed >= FollowUpConfig.THIRD_FOLLOWUP_DAYS:
-                    # Must have sent second follow-up
-                    if pd.notna(lead[CSVColumns.FOLLOWUP_2_SENT]) and lead[CSVColumns.FOLLOWUP_2_SENT]:
-                        # Check if not already sent third
-                        if pd.isna(lead[CSVColumns.FOLLOWUP_3_SENT]) or not lead[CSVColumns.FOLLOWUP_3_SENT]:
-                            leads_ready.append(idx)
+            self.templates[key] = CompiledTemplate(
+                subject, body, headers,
+                your_name=EmailConfig.YOUR_NAME,
+                your_phone=EmailConfig.YOUR_PHONE,
+                your_website=EmailConfig.YOUR_WEBSITE
+            )
         
-        return df.loc[leads_ready]
+        return self.templates[key]
     
-    def create_followup_message(self, lead, followup_number):
+    def thread_of(self, lead):
+        """(Gmail thread id, Message-IDs we sent) of a lead, or None if unknown."""
+        thread_id = lead.get(CSVColumns.GMAIL_THREAD_ID)
+        message_ids = lead.get(CSVColumns.THREAD_MESSAGE_IDS)
+        if not FollowUpConfig.THREAD_FOLLOWUPS or pd.isna(thread_id) or not thread_id or \
+           pd.isna(message_ids) or not str(message_ids).strip():
+            return None
+        return str(thread_id), str(message_ids).split()
+    
+    def create_followup_message(self, lead, followup_number, from_email=None):
         """Create follow-up email message."""
         business_name = lead[CSVColumns.BUSINESS_NAME]
         to_email = TestConfig.TEST_EMAIL if TestConfig.TEST_MODE else lead[CSVColumns.EMAIL]
         
-        # Select template based on follow-up number
-        if followup_number == 1:
-            subject = EmailTemplates.FOLLOWUP_1_SUBJECT.format(business_name=business_name)
-            body = EmailTemplates.FOLLOWUP_1_BODY.format(
-                business_name=business_name,
-                your_name=EmailConfig.YOUR_NAME,
-                your_phone=EmailConfig.YOUR_PHONE
-            )
+        from_email = from_email or EmailConfig.YOUR_EMAIL
+        thread = self.thread_of(lead)
         
-        elif followup_number == 2:
-            subject = EmailTemplates.FOLLOWUP_2_SUBJECT.format(business_name=business_name)
-            body = EmailTemplates.FOLLOWUP_2_BODY.format(
-                business_name=business_name,
-                your_name=EmailConfig.YOUR_NAME
-            )
+        template = self.template_for(followup_number, threaded=thread is not None)
+        if template is None:
+            return None
         
-        elif followup_number == 3:
-            subject = EmailTemplates.FOLLOWUP_3_SUBJECT.format(business_name=business_name)
-            body = EmailTemplates.FOLLOWUP_3_BODY.format(
-                business_name=business_name,
-                your_name=EmailConfig.YOUR_NAME,
-                your_phone=EmailConfig.YOUR_PHONE,
-                your_website=EmailConfig.YOUR_WEBSITE
-            )
+        headers = {'Message-ID': new_message_id(from_email)}
+        if thread:
+            thread_id, message_ids = thread
+            headers['In-Reply-To'] = message_ids[-1]
+            headers['References'] = ' '.join(message_ids)
         
-        else:
-            return None
+        # Constant bytes are prebuilt; only the per-lead slots are filled in
+        message = template.render(to_email, from_email, business_name, headers)
+        if thread:
+            message['threadId'] = thread_id
+        return message
+    
+    def record_sent(self, df, idx, followup_number, result):
+        """
+        Journal a sent follow-up and schedule the next one.
+        `result` is the Gmail response plus 'message_id' (our Message-ID header).
+        """
+        print(f"{Fore.GREEN}  ✅ Sent successfully! (ID: {result['id']})")
+        
+        # Journal the result (compacted into the CSV at the end)
+        thread = self.thread_of(df.loc[idx])
+        message_ids = (thread[1] if thread else []) + [result.get('message_id', '')]
+        updates = {
+            FOLLOWUP_COLUMNS[followup_number - 1]: datetime.now().strftime("%Y-%m-%d"),
+            CSVColumns.GMAIL_MESSAGE_ID: result['id'],
+            CSVColumns.GMAIL_THREAD_ID: result.get('threadId', ''),
+            CSVColumns.THREAD_MESSAGE_IDS: ' '.join(filter(None, message_ids))
+        }
         
-        # Create message
-        message = MIMEMultipart()
-        message['to'] = to_email
-        message['from'] = EmailConfig.YOUR_EMAIL
-        message['subject'] = subject
+        # Mark as dead after final follow-up, keeping any suppression on record
+        status = df.loc[idx, CSVColumns.STATUS]
+        if followup_number >= FollowUpConfig.MAX_FOLLOWUPS and \
+           status not in EmailConfig.SUPPRESSED_STATUSES + [DUPLICATE]:
+            updates[CSVColumns.STATUS] = "Dead"
+            print(f"{Fore.YELLOW}  💀 Marked as Dead (no response after {followup_number} follow-ups)")
         
-        # Add body
-        message.attach(MIMEText(body, 'plain'))
+        self.journal.record(df, idx, updates)
+        self.calendar.record_followup(idx, followup_number)
+        self.emails_sent_today += 1
+    
+    def record_result(self, df, idx, followup_number, success, result, counts):
+        """Per-lead bookkeeping for one batched send result."""
+        if success:
+            self.record_sent(df, idx, followup_number, result)
+            counts['success'] += 1
         
-        # Encode
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        elif result.retryable:
+            # Parked in the retry queue, sent again from there
+            print(f"{Fore.YELLOW}  ⏸️  Will retry Follow-Up #{followup_number}: {str(result)[:80]}")
         
-        return {'raw': raw_message}
+        else:
+            print(f"{Fore.RED}  ❌ Failed: {result}")
+            counts['fail'] += 1
     
-    def send_email(self, message_body):
-        """Send email via Gmail API."""
-        try:
-            message = self.service.users().messages().send(
-                userId='me',
-                body=message_body
-            ).execute()
+    def build_jobs(self, leads, followup_number, account):
+        """Yield (idx, message) pairs of one follow-up for leads pinned to `account`."""
+        for idx, lead in leads.iterrows():
+            email = TestConfig.TEST_EMAIL if TestConfig.TEST_MODE else lead[CSVColumns.EMAIL]
             
-            return True, message['id']
-        
-        except HttpError as error:
-            error_msg = str(error)
+            print(f"{Fore.CYAN}{'─'*70}")
+            print(f"{Fore.CYAN}📤 Follow-Up #{followup_number} to: {lead[CSVColumns.BUSINESS_NAME]} (via {account.email})")
+            print(f"{Fore.CYAN}📧 Email: {email}")
             
-            if 'quota' in error_msg.lower() or 'rate' in error_msg.lower():
-                print(f"  {Fore.RED}❌ Rate limit hit! Stopping.")
-                return False, "RATE_LIMIT"
+            try:
+                message = self.create_followup_message(lead, followup_number, account.email)
+            except Exception as e:
+                print(f"{Fore.RED}  ❌ Unexpected error: {e}")
+                continue
             
-            return False, error_msg
-        
-        except Exception as e:
-            return False, str(e)
+            if not message:
+                print(f"{Fore.RED}  ❌ Failed to create message")
+                continue
+            
+            yield idx, message
     
-    def send_followups(self, df, followup_number):
-        """Send a specific follow-up sequence."""
+    def send_followups(self, df, due):
+        """
+        Send every due follow-up ({followup_number: leads}) in paced batches,
+        one worker per sending account. Parked follow-ups are retried first.
+        """
         # Check if weekend
         if self.is_weekend():
-            print(f"{Fore.YELLOW}⏸️  Weekend detected - skipping sends")
+            print(f"{Fore.YELLOW}⏸️  Weekend or holiday - skipping sends")
             return df
         
-        # Filter leads
-        leads_to_send = self.filter_leads_for_followup(df, followup_number)
+        # Follow-ups already parked for a retry go out from the retry queue
+        parked = self.pool.retry_queue.parked_keys('followup')
+        followup_numbers = {}
+        for followup_number, leads_to_send in due.items():
+            leads_to_send = leads_to_send[~leads_to_send.index.isin(list(parked))]
+            print(f"{Fore.CYAN}Follow-Up #{followup_number}: {len(leads_to_send)} leads ready")
+            followup_numbers.update((idx, followup_number) for idx in leads_to_send.index)
         
-        if len(leads_to_send) == 0:
-            print(f"{Fore.YELLOW}No leads ready for Follow-Up #{followup_number}")
+        retry_accounts = self.pool.accounts_with_retries('followup')
+        if not followup_numbers and not retry_accounts:
+            print(f"{Fore.YELLOW}No leads ready for follow-ups")
             return df
         
-        print(f"\n{Fore.GREEN}📧 {len(leads_to_send)} leads ready for Follow-Up #{followup_number}\n")
+        # Follow-ups go out from the mailbox that first contacted the lead
+        leads = df.loc[list(followup_numbers)]
+        owners = leads[CSVColumns.SENDER_ACCOUNT].fillna('').replace('', self.pool.default.email)
+        jobs_by_account = {}
+        for account in self.pool.accounts:
+            if account.service is None:
+                continue
+            mine = leads[(owners == account.email).to_numpy()]
+            if len(mine) or account in retry_accounts:
+                jobs_by_account[account] = chain.from_iterable(
+                    self.build_jobs(mine[mine.index.map(followup_numbers) == number], number, account)
+                    for number in sorted(due)
+                )
         
-        # Column name for this follow-up
-        followup_col = [
-            CSVColumns.FOLLOWUP_1_SENT,
-            CSVColumns.FOLLOWUP_2_SENT,
-            CSVColumns.FOLLOWUP_3_SENT
-        ][followup_number - 1]
+        stranded = len(leads) - int(owners.isin([account.email for account in jobs_by_account]).sum())
+        if stranded:
+            print(f"{Fore.YELLOW}⚠️  {stranded} follow-ups wait for an account that isn't connected")
         
-        success_count = 0
-        fail_count = 0
+        counts = {'success': 0, 'fail': 0}
         
-        for idx, lead in leads_to_send.iterrows():
-            business_name = lead[CSVColumns.BUSINESS_NAME]
-            email = TestConfig.TEST_EMAIL if TestConfig.TEST_MODE else lead[CSVColumns.EMAIL]
-            
-            print(f"{Fore.CYAN}{'─'*70}")
-            print(f"{Fore.CYAN}📤 Follow-Up #{followup_number} to: {business_name}")
-            print(f"{Fore.CYAN}📧 Email: {email}")
-            
-            try:
-                # Create message
-                message = self.create_followup_message(lead, followup_number)
-                
-                if not message:
-                    print(f"{Fore.RED}  ❌ Failed to create message")
-                    fail_count += 1
-                    continue
-                
-                # Send
-                success, result = self.send_email(message)
-                
-                if success:
-                    print(f"{Fore.GREEN}  ✅ Sent successfully! (ID: {result})")
-                    
-                    # Update CSV
-                    df.loc[idx, followup_col] = datetime.now().strftime("%Y-%m-%d")
-                    
-                    # Mark as dead after final follow-up
-                    if followup_number >= FollowUpConfig.MAX_FOLLOWUPS:
-                        df.loc[idx, CSVColumns.STATUS] = "Dead"
-                        print(f"{Fore.YELLOW}  💀 Marked as Dead (no response after {followup_number} follow-ups)")
-                    
-                    success_count += 1
-                    self.emails_sent_today += 1
-                
-                else:
-                    if result == "RATE_LIMIT":
-                        fail_count += 1
-                        break
-                    else:
-                        print(f"{Fore.RED}  ❌ Failed: {result}")
-                        fail_count += 1
-                
-                # Save progress
-                df.to_csv(FilePaths.LEADS_CSV, index=False)
-                
-                # Delay between sends
-                if success and idx < leads_to_send.index[-1]:
-                    delay = EmailConfig.DELAY_BETWEEN_SENDS
-                    print(f"{Fore.CYAN}  ⏳ Waiting {delay} seconds...")
-                    time.sleep(delay)
-            
-            except KeyboardInterrupt:
-                print(f"\n{Fore.YELLOW}⚠️  Interrupted by user. Progress saved.")
-                df.to_csv(FilePaths.LEADS_CSV, index=False)
-                break
-            
-            except Exception as e:
-                print(f"{Fore.RED}  ❌ Unexpected error: {e}")
-                fail_count += 1
-                df.to_csv(FilePaths.LEADS_CSV, index=False)
+        def record_result(account, idx, success, result):
+            # Retried follow-ups weren't due in this run's list
+            number = followup_numbers.get(idx) or next_followup_number(df.loc[idx])
+            self.record_result(df, idx, number, success, result, counts)
+        
+        try:
+            self.pool.send_parallel(
+                jobs_by_account, record_result, kind='followup',
+                eligible=lambda keys: self.still_due(df, keys)
+            )
+        
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}⚠️  Interrupted by user. Progress saved.")
         
         # Summary
-        print(f"\n{Fore.CYAN}Follow-Up #{followup_number} Summary:")
-        print(f"{Fore.GREEN}  ✅ Sent: {success_count}")
-        print(f"{Fore.RED}  ❌ Failed: {fail_count}")
+        print(f"\n{Fore.CYAN}Follow-Up Summary:")
+        print(f"{Fore.GREEN}  ✅ Sent: {counts['success']}")
+        print(f"{Fore.RED}  ❌ Failed: {counts['fail']}")
         
         return df
 
@@ -323,16 +297,15 @@ def main():
     if df is None:
         return
     
-    # Send each follow-up sequence
-    for followup_num in range(1, FollowUpConfig.MAX_FOLLOWUPS + 1):
-        print(f"\n{Fore.CYAN}{'='*70}")
-        print(f"{Fore.CYAN}Processing Follow-Up #{followup_num}")
-        print(f"{Fore.CYAN}{'='*70}")
-        
-        df = sender.send_followups(df, followup_num)
+    # Work out who is due for which follow-up before anything is sent,
+    # so a lead never gets two follow-ups in the same run
+    due = sender.filter_leads_for_followups(df)
+    
+    # Send every follow-up stage through each account's paced sender
+    df = sender.send_followups(df, due)
     
-    # Final save
-    df.to_csv(FilePaths.LEADS_CSV, index=False)
+    # Final save - fold the journal into leads.csv
+    sender.journal.compact(df)
     
     print(f"\n{Fore.CYAN}{'='*70}")
     print(f"{Fore.CYAN}📊 FOLLOW-UP SESSION SUMMARY")
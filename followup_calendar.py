@@ -0,0 +1,302 @@
+"""
+Follow-Up Calendar - Persistent Index of Upcoming Follow-Ups
+Due dates follow directly from Date_Sent and the FollowUpConfig offsets
+(business days when weekends are skipped, so follow-ups spread over the
+week instead of piling up on Monday),
+so each contacted lead's next follow-up is stored as one (due, lead, stage)
+row in SQLite, indexed by due date. A run reads only the entries due today
+instead of rescanning every lead. Sends advance entries, replies and
+unsubscribes cancel them.
+"""
+
+import os
+import json
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from lead_dedup import DUPLICATE
+from colorama import Fore
+
+from config_email import EmailConfig, FollowUpConfig, CSVColumns, FilePaths
+from sqlite_store import SQLiteStore
+
+FOLLOWUP_COLUMNS = [
+    CSVColumns.FOLLOWUP_1_SENT,
+    CSVColumns.FOLLOWUP_2_SENT,
+    CSVColumns.FOLLOWUP_3_SENT
+]
+
+
+def followup_delays():
+    """Days after the initial email that each follow-up is due."""
+    return [
+        FollowUpConfig.FIRST_FOLLOWUP_DAYS,
+        FollowUpConfig.SECOND_FOLLOWUP_DAYS,
+        FollowUpConfig.THIRD_FOLLOWUP_DAYS
+    ]
+
+
+@lru_cache(maxsize=None)
+def _read_holidays(path, mtime):
+    holidays = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                holidays.append(np.datetime64(line, 'D'))
+            except ValueError:
+                print(f"{Fore.YELLOW}⚠️  Ignoring bad date in {path}: {line}")
+    return tuple(sorted(holidays))
+
+
+def load_holidays():
+    """Dates listed in FollowUpConfig.HOLIDAYS_FILE (empty if there's no file)."""
+    path = FollowUpConfig.HOLIDAYS_FILE
+    if not path or not os.path.exists(path):
+        return ()
+    return _read_holidays(path, os.path.getmtime(path))
+
+
+def business_calendar():
+    """Mon-Fri minus holidays, or None when follow-ups count calendar days."""
+    if not FollowUpConfig.SKIP_WEEKENDS:
+        return None
+    return np.busdaycalendar(weekmask='1111100', holidays=list(load_holidays()))
+
+
+def is_day_off(day=None):
+    """True on weekends and holidays when those are skipped."""
+    calendar = business_calendar()
+    if calendar is None:
+        return False
+    return not np.is_busday(np.datetime64(day or date.today(), 'D'), busdaycal=calendar)
+
+
+def due_dates(sent_on, stages):
+    """
+    Due date of follow-up `stages` (array) for leads first emailed on
+    `sent_on` (Series), for every lead in one vectorized call.
+    """
+    delays = np.array([0] + followup_delays())[stages]
+    calendar = business_calendar()
+    if calendar is None:
+        return sent_on + pd.to_timedelta(delays, unit='D')
+
+    # Business days: a Friday send with a 3-day offset is due Wednesday
+    known = sent_on.notna().to_numpy()
+    due = np.full(len(sent_on), np.datetime64('NaT'), dtype='datetime64[D]')
+    due[known] = np.busday_offset(
+        sent_on.to_numpy()[known].astype('datetime64[D]'), delays[known],
+        roll='forward', busdaycal=calendar
+    )
+    return pd.Series(due.astype('datetime64[ns]'), index=sent_on.index)
+
+
+def _filled(series):
+    """True where a CSV cell holds a value (not NaN or blank)."""
+    return (series.notna() & (series.astype(str).str.strip() != '')).to_numpy()
+
+
+def followup_schedule(df):
+    """
+    Next follow-up for every lead, computed in one vectorized pass.
+    Returns a DataFrame indexed like df with:
+      stage         - next follow-up number (0 = none left, or not followed up)
+      due           - date that follow-up is due
+      sent_on       - date of the first email
+      last_contact  - date of the most recent email to the lead
+    """
+    sent_on = pd.to_datetime(df[CSVColumns.DATE_SENT], format="%Y-%m-%d", errors='coerce')
+    followups_on = [
+        pd.to_datetime(df[col], format="%Y-%m-%d", errors='coerce') for col in FOLLOWUP_COLUMNS
+    ]
+
+    response = df[CSVColumns.RESPONSE]
+    eligible = (
+        (df[CSVColumns.EMAIL_SENT] == True).to_numpy()
+        & sent_on.notna().to_numpy()
+        & (response.isna() | (response == '')).to_numpy()
+        & ~df[CSVColumns.STATUS].isin(EmailConfig.SUPPRESSED_STATUSES + [DUPLICATE]).to_numpy()
+    )
+
+    # The next stage is the first follow-up not yet sent
+    done = np.column_stack([_filled(df[col]) for col in FOLLOWUP_COLUMNS])
+    stage = np.where(done.all(axis=1), 0, (~done).argmax(axis=1) + 1)
+    stage = np.where(eligible & (stage <= FollowUpConfig.MAX_FOLLOWUPS), stage, 0)
+
+    return pd.DataFrame({
+        'stage': stage,
+        'due': due_dates(sent_on, stage).where(stage > 0),
+        'sent_on': sent_on,
+        'last_contact': pd.concat([sent_on] + followups_on, axis=1).max(axis=1)
+    }, index=df.index)
+
+
+def due_followups(df, today=None):
+    """
+    Leads due for each follow-up today, from a single pass over df.
+    Returns {followup_number: DataFrame of leads}, for 1..MAX_FOLLOWUPS.
+    """
+    today = pd.Timestamp(today or date.today())
+    schedule = followup_schedule(df)
+    is_due = (schedule['stage'] > 0) & (schedule['due'] <= today)
+
+    return {
+        number: df[is_due & (schedule['stage'] == number)]
+        for number in range(1, FollowUpConfig.MAX_FOLLOWUPS + 1)
+    }
+
+
+class FollowUpCalendar(SQLiteStore):
+    """SQLite table of each lead's next follow-up, indexed by due date."""
+
+    VERSION = 2
+
+    def __init__(self, path=None):
+        super().__init__(path or FilePaths.FOLLOWUP_DB)
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS followups (
+                lead_key INTEGER PRIMARY KEY,
+                stage INTEGER NOT NULL,
+                due TEXT NOT NULL,
+                sent_on TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS followups_due ON followups (due)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _signature(self):
+        """Config that affects which follow-ups are scheduled and when."""
+        return json.dumps({
+            'version': self.VERSION,
+            'delays': followup_delays(),
+            'max_followups': FollowUpConfig.MAX_FOLLOWUPS,
+            'suppressed': list(EmailConfig.SUPPRESSED_STATUSES),
+            'business_days': FollowUpConfig.SKIP_WEEKENDS,
+            'holidays': [str(day) for day in load_holidays()]
+        })
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM followups").fetchone()[0]
+
+    def _write(self, schedule, replace_all=False):
+        """Store a followup_schedule() frame: stage 0 rows are removed."""
+        pending = schedule['stage'] > 0
+        upserts = [
+            (int(key), int(stage), due.strftime("%Y-%m-%d"), sent.strftime("%Y-%m-%d"))
+            for key, stage, due, sent in zip(
+                schedule.index[pending], schedule['stage'][pending],
+                schedule['due'][pending], schedule['sent_on'][pending]
+            )
+        ]
+        deletes = [(int(key),) for key in schedule.index[~pending]]
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if replace_all:
+                conn.execute("DELETE FROM followups")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (self._signature(),))
+            conn.executemany("INSERT OR REPLACE INTO followups VALUES (?, ?, ?, ?)", upserts)
+            conn.executemany("DELETE FROM followups WHERE lead_key = ?", deletes)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rebuild(self, df):
+        """Schedule every lead from scratch."""
+        self._write(followup_schedule(df), replace_all=True)
+
+    def load(self, df):
+        """Rebuild if the calendar is new or was built with other settings."""
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE key = 'signature'"
+        ).fetchone()
+        if not row or row[0] != self._signature():
+            self.rebuild(df)
+        return self
+
+    def refresh(self, df, rows):
+        """Re-derive the entries of specific rows whose data changed."""
+        rows = [row for row in rows if row in df.index]
+        if rows:
+            self._write(followup_schedule(df.loc[rows]))
+
+    def record_sent(self, key, sent_on=None):
+        """A first email went out: schedule follow-up #1."""
+        if FollowUpConfig.MAX_FOLLOWUPS < 1:
+            return
+        self._schedule(key, 1, pd.Timestamp(sent_on or date.today()))
+
+    def record_followup(self, key, stage):
+        """Follow-up `stage` went out: schedule the next one, or finish the sequence."""
+        row = self._connection().execute(
+            "SELECT sent_on FROM followups WHERE lead_key = ?", (int(key),)
+        ).fetchone()
+
+        if row is None or stage >= FollowUpConfig.MAX_FOLLOWUPS:
+            self.cancel(key)
+        else:
+            self._schedule(key, stage + 1, pd.Timestamp(row[0]))
+
+    def _schedule(self, key, stage, sent_on):
+        due = due_dates(pd.Series([sent_on]), np.array([stage]))[0]
+        self._connection().execute(
+            "INSERT OR REPLACE INTO followups VALUES (?, ?, ?, ?)",
+            (int(key), stage, due.strftime("%Y-%m-%d"), sent_on.strftime("%Y-%m-%d"))
+        )
+
+    def cancel(self, key):
+        """Drop a lead's pending follow-up (replied, unsubscribed, done)."""
+        self._connection().execute("DELETE FROM followups WHERE lead_key = ?", (int(key),))
+
+    def cancel_all(self, keys):
+        """Drop the pending follow-ups of many leads, in one transaction."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM followups WHERE lead_key = ?", [(int(key),) for key in keys])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def due(self, df, today=None):
+        """
+        Leads due for each follow-up today, read from the due-date index.
+        Entries are re-checked against df (a reply may have arrived since),
+        and stale ones are fixed in place. Returns {followup_number: leads}.
+        """
+        today = pd.Timestamp(today or date.today())
+        entries = self._connection().execute(
+            "SELECT lead_key, stage, due FROM followups WHERE due <= ? ORDER BY due, lead_key",
+            (today.strftime("%Y-%m-%d"),)
+        ).fetchall()
+
+        stored = pd.DataFrame(entries, columns=['lead_key', 'stage', 'due']).set_index('lead_key')
+        for key in stored.index[~stored.index.isin(df.index)]:
+            self.cancel(key)  # Row no longer in leads.csv
+        stored = stored[stored.index.isin(df.index)]
+
+        leads = df.loc[stored.index]
+
+        # One vectorized check of just today's rows; fix entries that drifted
+        schedule = followup_schedule(leads)
+        changed = (schedule['stage'].to_numpy() != stored['stage'].to_numpy()) | \
+            (schedule['due'].dt.strftime("%Y-%m-%d").to_numpy() != stored['due'].to_numpy())
+        if changed.any():
+            self._write(schedule[changed])
+
+        is_due = ((schedule['stage'] > 0) & (schedule['due'] <= today)).to_numpy()
+        return {
+            number: leads[is_due & (schedule['stage'] == number).to_numpy()]
+            for number in range(1, FollowUpConfig.MAX_FOLLOWUPS + 1)
+        }
@@ -22,7 +22,8 @@ SCOPES = [
 class GmailAuthenticator:
     """Handles Gmail API authentication and service creation."""
     
-    def __init__(self):
+    def __init__(self, token_file=None):
+        self.token_file = token_file or EmailConfig.TOKEN_FILE
         self.creds = None
         self.service = None
     
@@ -32,11 +33,11 @@ class GmailAuthenticator:
         Opens browser on first run for authorization.
         """
         # Check if we have saved credentials
-        if os.path.exists(EmailConfig.TOKEN_FILE):
+        if os.path.exists(self.token_file):
             if LogConfig.LOG_TO_CONSOLE:
                 print("📁 Loading saved credentials...")
             
-            with open(EmailConfig.TOKEN_FILE, 'rb') as token:
+            with open(self.token_file, 'rb') as token:
                 self.creds = pickle.load(token)
         
         # If credentials are invalid or don't exist, get new ones
@@ -58,7 +59,7 @@ class GmailAuthenticator:
                 self.creds = self._get_new_credentials()
             
             # Save credentials for future use
-            with open(EmailConfig.TOKEN_FILE, 'wb') as token:
+            with open(self.token_file, 'wb') as token:
                 pickle.dump(self.creds, token)
             
             if LogConfig.LOG_TO_CONSOLE:
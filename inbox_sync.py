@@ -0,0 +1,50 @@
+"""
+Inbox Sync - Last Gmail History Id Seen per Mailbox
+The response tracker asks Gmail only for inbox changes since this history
+id instead of re-listing two weeks of mail on every run. New ids are staged
+while a run is in progress and only written once the replies they cover
+have been saved to leads.csv.
+"""
+
+import os
+import json
+
+from config_email import FilePaths
+
+
+class HistoryCursor:
+    """Persisted {mailbox: Gmail historyId} for incremental inbox sync."""
+
+    def __init__(self, path=None):
+        self.path = path or FilePaths.INBOX_SYNC_STATE
+        self.history_ids = {}
+        self.staged = {}  # Advanced this run, not saved yet
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.history_ids = json.load(f)
+            except (ValueError, OSError):
+                self.history_ids = {}  # Unreadable - the next run does a full scan
+
+    def get(self, account):
+        """Last synced history id of a mailbox (None before its first sync)."""
+        return self.history_ids.get(account)
+
+    def advance(self, account, history_id):
+        """Stage a mailbox's new history id until save()."""
+        if history_id:
+            self.staged[account] = str(history_id)
+
+    def save(self):
+        """Persist staged history ids atomically."""
+        if not self.staged:
+            return
+
+        self.history_ids.update(self.staged)
+        self.staged = {}
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.history_ids, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,276 @@
+"""
+Lead Deduplication - Hash Index of Lead Identities
+The same business often turns up in leads.csv more than once (different
+searches, different rotation days). Each lead is keyed by its normalized
+email and the registrable domain of its website (optionally also its
+normalized business name); a row sharing any key with an earlier lead is
+merged into it and marked as a duplicate. The index is persisted, so later
+loads only hash rows appended since the last run.
+"""
+
+import os
+import json
+from functools import lru_cache
+
+import pandas as pd
+import tldextract
+
+from config_email import EmailConfig, CSVColumns, FilePaths
+
+# Status of rows that were merged into an earlier lead
+DUPLICATE = "Duplicate"
+
+# Columns describing our contact with a lead, moved together when merging
+TRACKING_COLUMNS = [
+    CSVColumns.EMAIL_SENT, CSVColumns.DATE_SENT, CSVColumns.SEND_STATUS,
+    CSVColumns.FOLLOWUP_1_SENT, CSVColumns.FOLLOWUP_2_SENT, CSVColumns.FOLLOWUP_3_SENT,
+    CSVColumns.STATUS, CSVColumns.SENDER_ACCOUNT, CSVColumns.EMAIL,
+    CSVColumns.GMAIL_MESSAGE_ID, CSVColumns.GMAIL_THREAD_ID, CSVColumns.THREAD_MESSAGE_IDS
+]
+RESPONSE_COLUMNS = [CSVColumns.RESPONSE, CSVColumns.RESPONSE_DATE, CSVColumns.RESPONSE_TEXT]
+
+# Offline extractor (bundled suffix list); private suffixes like blogspot.com
+# count as public so each blog gets its own registrable domain
+_extract = tldextract.TLDExtract(suffix_list_urls=(), include_psl_private_domains=True)
+
+_NAME_PUNCTUATION = r"[^0-9a-z ]+"
+_NAME_FILLER = r"\b(?:the|llc|inc|co|corp|company|ltd|pllc)\b"
+
+
+def _blank(value):
+    return pd.isna(value) or value == ''
+
+
+@lru_cache(maxsize=None)
+def registrable_domain(url):
+    """'https://shop.example.co.uk/about' -> 'example.co.uk' ('' if unknown)."""
+    if not url:
+        return ''
+    return _extract(url).registered_domain.lower()
+
+
+@lru_cache(maxsize=1)
+def _suffix_rules():
+    """
+    From the bundled public suffix list: every label tail of every rule
+    ('co.uk' gives 'uk' and 'co.uk'), the top-level rules, and top-level
+    labels under a wildcard rule ('*.ck').
+    """
+    tails = set()
+    top_level = set()
+    wildcard_top_level = set()
+    for rule in _extract.tlds:
+        if rule.startswith('*.') and rule.count('.') == 1:
+            wildcard_top_level.add(rule[2:])
+        labels = rule.lstrip('!*.').split('.')
+        for i in range(len(labels)):
+            tails.add('.'.join(labels[i:]))
+        if len(labels) == 1:
+            top_level.add(labels[0])
+    return frozenset(tails), frozenset(top_level), frozenset(wildcard_top_level)
+
+
+def registrable_domains(hosts):
+    """
+    registrable_domain() for a whole Series of host names. Hosts under a
+    one-label suffix (business.com) are resolved from the suffix rules in a
+    single pass; the few under a longer suffix (shop.co.uk, x.blogspot.com)
+    or an unusual one go through tldextract.
+    """
+    tails, top_level, wildcard_top_level = _suffix_rules()
+
+    domains = []
+    for host in hosts.tolist():
+        host = host.strip().lower().strip('.') if isinstance(host, str) else ''
+        labels = host.rsplit('.', 2)
+        if len(labels) > 1 and labels[-2]:
+            last_two = labels[-2] + '.' + labels[-1]
+            if labels[-1] in top_level and labels[-1] not in wildcard_top_level and \
+               last_two not in tails:
+                domains.append(last_two)
+                continue
+        domains.append(registrable_domain(host))
+
+    return pd.Series(domains, index=hosts.index, dtype=object)
+
+
+def normalize_emails(series):
+    """Lowercased emails without whitespace or a mailto: prefix."""
+    return (
+        series.fillna('').astype(str)
+        .str.strip().str.lower()
+        .str.replace(r'^mailto:', '', regex=True)
+    )
+
+
+def normalize_names(series):
+    """Business names with case, punctuation and legal suffixes removed."""
+    return (
+        series.fillna('').astype(str)
+        .str.casefold()
+        .str.replace('&', ' and ', regex=False)
+        .str.replace(_NAME_PUNCTUATION, ' ', regex=True)
+        .str.replace(_NAME_FILLER, ' ', regex=True)
+        .str.split().str.join(' ')
+    )
+
+
+class DedupIndex:
+    """Maps identity keys ('email:...', 'domain:...', 'name:...') to lead rows."""
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path or FilePaths.DEDUP_INDEX
+        self.keys = {}
+        self.row_count = 0  # Rows of leads.csv already hashed
+        self.merged = {}  # duplicate row -> row it was merged into (this load)
+        self.restored = []  # rows no longer duplicates under the current keys (this load)
+
+    def _signature(self):
+        """Config that affects which rows count as the same lead."""
+        return {
+            'version': self.VERSION,
+            'keys': list(EmailConfig.DEDUP_KEYS),
+            'shared_domains': sorted(EmailConfig.DEDUP_SHARED_DOMAINS)
+        }
+
+    def _load_state(self, df):
+        """Read the persisted index, or start over if it doesn't fit df."""
+        state = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    state = json.load(f)
+            except (ValueError, OSError):
+                state = None
+
+        if not state or state.get('signature') != self._signature() or \
+           state.get('row_count', 0) > len(df):
+            self.keys = {}
+            self.row_count = 0
+        else:
+            self.keys = state['keys']
+            self.row_count = state['row_count']
+
+    def _row_keys(self, df_slice):
+        """Identity keys for each row of a slice, as a list of lists."""
+        columns = []
+
+        if 'email' in EmailConfig.DEDUP_KEYS:
+            emails = normalize_emails(df_slice[CSVColumns.EMAIL])
+            columns.append(('email:' + emails).where(emails != ''))
+
+        if 'domain' in EmailConfig.DEDUP_KEYS:
+            shared = set(EmailConfig.DEDUP_SHARED_DOMAINS)
+            domains = pd.Series(
+                [registrable_domain(url) if isinstance(url, str) else '' for url in df_slice[CSVColumns.URL]],
+                index=df_slice.index
+            )
+            columns.append(('domain:' + domains).where((domains != '') & ~domains.isin(shared)))
+
+        if 'name' in EmailConfig.DEDUP_KEYS:
+            names = normalize_names(df_slice[CSVColumns.BUSINESS_NAME])
+            columns.append(('name:' + names).where(names != ''))
+
+        if not columns:
+            return [[] for _ in range(len(df_slice))]
+
+        return [
+            [key for key in keys if isinstance(key, str)]
+            for keys in zip(*(column.tolist() for column in columns))
+        ]
+
+    @staticmethod
+    def _fill(df, keep, dup, columns, take):
+        """Copy `columns` from dup rows to kept rows where `take` is set (first dup wins)."""
+        targets = pd.Index(keep[take]).drop_duplicates()
+        if targets.empty:
+            return
+        sources = pd.Series(dup[take], index=keep[take])
+        sources = sources[~sources.index.duplicated()].loc[targets]
+
+        for col in columns:
+            df.loc[targets, col] = df.loc[sources.to_numpy(), col].to_numpy()
+
+    def _merge(self, df, merged):
+        """Fold duplicate rows into the leads we already have, column by column."""
+        dup = pd.Index(list(merged))
+        keep = pd.Index(list(merged.values()))
+        dup_rows = df.loc[dup]
+        keep_rows = df.loc[keep]
+
+        # Whichever row we actually contacted carries the contact history
+        sent = (dup_rows[CSVColumns.EMAIL_SENT] == True).to_numpy() & \
+            (keep_rows[CSVColumns.EMAIL_SENT] != True).to_numpy()
+        self._fill(df, keep, dup, TRACKING_COLUMNS, sent)
+
+        dup_replied = ~dup_rows[CSVColumns.RESPONSE].map(_blank).to_numpy()
+        keep_replied = ~keep_rows[CSVColumns.RESPONSE].map(_blank).to_numpy()
+        self._fill(df, keep, dup, RESPONSE_COLUMNS + [CSVColumns.STATUS], dup_replied & ~keep_replied)
+
+        # Fill in anything the first scrape missed (email, screenshot, ...)
+        for col in df.columns:
+            if col in RESPONSE_COLUMNS or col in TRACKING_COLUMNS and col != CSVColumns.EMAIL:
+                continue
+            missing = keep_rows[col].map(_blank).to_numpy() & ~dup_rows[col].map(_blank).to_numpy()
+            self._fill(df, keep, dup, [col], missing)
+
+        df.loc[dup, CSVColumns.STATUS] = DUPLICATE
+
+    def changed_rows(self):
+        """Rows merged, merged into or restored on the last load."""
+        return list(self.merged) + list(set(self.merged.values())) + self.restored
+
+    def merge_new_rows(self, df):
+        """
+        Hash rows added since the last run and merge duplicates into the
+        earliest matching lead, in place. Returns {duplicate row: kept row}.
+        When the whole file is re-hashed, earlier duplicates that match no
+        lead under the current keys are made active again.
+        """
+        self._load_state(df)
+        self.merged = {}
+        self.restored = []
+        rehash = self.row_count == 0
+
+        new_rows = df.iloc[self.row_count:]
+        row_keys = self._row_keys(new_rows)
+        statuses = new_rows[CSVColumns.STATUS].tolist()
+
+        for row, keys, status in zip(new_rows.index.tolist(), row_keys, statuses):
+            matches = [self.keys[key] for key in keys if key in self.keys]
+
+            if status == DUPLICATE:
+                # Merged on an earlier run; after a key change, rows that no
+                # longer match an earlier lead become leads of their own
+                if not rehash or matches:
+                    continue
+                self.restored.append(row)
+
+            keep = min(matches) if matches else row
+            if matches:
+                self.merged[row] = keep
+
+            # The duplicate's other keys now identify the kept lead too
+            for key in keys:
+                self.keys.setdefault(key, keep)
+
+        if self.restored:
+            df.loc[self.restored, CSVColumns.STATUS] = 'Active'
+        if self.merged:
+            self._merge(df, self.merged)
+
+        self.row_count = len(df)
+        return self.merged
+
+    def save(self):
+        """Persist the index atomically."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'signature': self._signature(),
+                'row_count': self.row_count,
+                'keys': self.keys
+            }, f)
+        os.replace(tmp_path, self.path)
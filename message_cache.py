@@ -0,0 +1,82 @@
+"""
+Message Cache - Inbox Messages the Response Tracker Already Processed
+SQLite table keyed by Gmail message id with the sender, how the message was
+classified and a digest of its body. The tracker drops cached ids before
+making any API call, so re-scanning the same days of mail costs nothing.
+Entries are written once leads.csv holds their results, and evicted by age.
+"""
+
+import time
+import hashlib
+
+from config_email import ResponseConfig, FilePaths
+from sqlite_store import SQLiteStore
+
+# Classifications of messages that weren't recorded as a lead's reply
+NOT_A_LEAD = "NOT_A_LEAD"  # Sent by us, or by someone who isn't a lead
+ALREADY_REPLIED = "ALREADY_REPLIED"  # The lead's reply was recorded before this one
+BOUNCE = "BOUNCE"  # Delivery failure notice (its addresses are marked Bounced)
+
+
+def body_digest(body_text):
+    """Short stable digest of a message body."""
+    return hashlib.sha256((body_text or '').encode('utf-8')).hexdigest()[:32]
+
+
+class ProcessedMessageCache(SQLiteStore):
+    """Gmail message id -> (sender, classification, body digest)."""
+
+    def __init__(self, path=None):
+        super().__init__(path or FilePaths.MESSAGE_CACHE_DB)
+        self.pending = []  # Recorded this run, written on save()
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed (
+                message_id TEXT PRIMARY KEY,
+                sender TEXT,
+                classification TEXT NOT NULL,
+                digest TEXT,
+                processed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS processed_age ON processed (processed_at)")
+
+    def seen(self, message_ids):
+        """The ids among `message_ids` that were already processed."""
+        message_ids = list(message_ids)
+        found = set()
+
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(message_ids), 500):
+            chunk = message_ids[start:start + 500]
+            rows = self._connection().execute(
+                f"SELECT message_id FROM processed WHERE message_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            found.update(message_id for message_id, in rows)
+
+        wanted = set(message_ids)
+        found.update(entry[0] for entry in self.pending if entry[0] in wanted)
+        return found
+
+    def record(self, message_id, sender, classification, body_text=None):
+        """Remember a processed message (kept in memory until save())."""
+        digest = body_digest(body_text) if body_text is not None else None
+        self.pending.append((message_id, sender, classification, digest, time.time()))
+
+    def save(self):
+        """Write this run's entries and evict those older than MESSAGE_CACHE_DAYS."""
+        cutoff = time.time() - ResponseConfig.MESSAGE_CACHE_DAYS * 86400
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?)", self.pending)
+            conn.execute("DELETE FROM processed WHERE processed_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.pending = []
@@ -0,0 +1,101 @@
+"""
+Message Parts - Text of a Gmail API Message Payload
+Walks the MIME tree of a message ('parts' nested to any depth) lazily,
+stops at the first text/plain part and falls back to the first text/html
+part converted to plain text. Only the first max_bytes of a text part are
+decoded - the tracker never needs more than the start of a reply. HTML is
+cut after it's converted, since style and head blocks can fill its start.
+"""
+
+import re
+import html
+import base64
+
+from config_email import ResponseConfig
+
+_CHARSET = re.compile(r'charset\s*=\s*"?([\w.:-]+)', re.IGNORECASE)
+
+# Crude but fast HTML -> text: drop invisible blocks, break on block tags, strip the rest
+_HTML_INVISIBLE = re.compile(r'<(script|style|head)\b.*?(?:</\1\s*>|$)', re.IGNORECASE | re.DOTALL)
+_HTML_BREAK = re.compile(r'<(?:br|/p|/div|/li|/tr|/h[1-6]|/blockquote)\b[^>]*>', re.IGNORECASE)
+_HTML_TAG = re.compile(r'<[^>]*(?:>|$)')
+_BLANK_LINES = re.compile(r' *\n\s*')
+_SPACES = re.compile(r'[ \t\r\f\v\xa0]+')
+
+
+def _header(part, name):
+    """Value of a part header ('' if missing)."""
+    for header in part.get('headers', []):
+        if header['name'].lower() == name:
+            return header['value']
+    return ''
+
+
+def is_attachment(part):
+    """True for parts sent as files rather than as the message text."""
+    return bool(part.get('filename')) or \
+        _header(part, 'content-disposition').lower().startswith('attachment')
+
+
+def walk_parts(payload):
+    """Every leaf part of a payload, depth first, in message order (a generator)."""
+    parts = payload.get('parts')
+    if not parts:
+        yield payload
+        return
+
+    for part in parts:
+        yield from walk_parts(part)
+
+
+def decode_part(part, max_bytes=None):
+    """Text of one leaf part, decoding at most max_bytes of it."""
+    data = part.get('body', {}).get('data')
+    if not data:
+        return ''  # Empty, or too big to be inlined (attachmentId)
+
+    # base64 decodes in 4-character groups of 3 bytes each
+    if max_bytes:
+        data = data[:4 * -(-max_bytes // 3)]
+    raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))[:max_bytes or None]
+
+    charset = _CHARSET.search(_header(part, 'content-type'))
+    try:
+        return raw.decode(charset.group(1) if charset else 'utf-8', errors='ignore')
+    except LookupError:
+        return raw.decode('utf-8', errors='ignore')  # Unknown charset name
+
+
+def html_to_text(markup):
+    """Readable text of an HTML part, good enough to classify a reply."""
+    markup = _HTML_INVISIBLE.sub(' ', markup)
+    markup = _HTML_BREAK.sub('\n', markup)
+    text = html.unescape(_HTML_TAG.sub(' ', markup))
+    text = _SPACES.sub(' ', text)
+    return _BLANK_LINES.sub('\n', text).strip()
+
+
+def message_text(payload, max_bytes=None):
+    """
+    Body text of a message: the first text/plain part, else the first
+    text/html part as plain text ('' if there is neither).
+    """
+    max_bytes = max_bytes or ResponseConfig.BODY_MAX_BYTES
+    first_html = None
+
+    for part in walk_parts(payload):
+        if is_attachment(part):
+            continue
+
+        mime_type = part.get('mimeType', 'text/plain').lower()
+        if mime_type == 'text/plain':
+            text = decode_part(part, max_bytes)
+            if text.strip():
+                return text
+        elif mime_type == 'text/html' and first_html is None:
+            first_html = part
+
+    if first_html is not None:
+        text = html_to_text(decode_part(first_html, ResponseConfig.HTML_MAX_BYTES))
+        return text.encode('utf-8')[:max_bytes].decode('utf-8', errors='ignore')
+    return ''
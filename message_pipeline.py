@@ -0,0 +1,89 @@
+"""
+Message Pipeline - Render Emails Ahead of the Sender
+A thread pool formats, attaches and base64-encodes messages while the sender
+is busy with the network. A bounded queue caps how many rendered messages
+are held in memory at once.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config_email import EmailConfig
+
+_DONE = object()  # Marks the end of the render queue
+
+
+class RenderPipeline:
+    """Producer/consumer pipeline that renders messages on a worker pool."""
+
+    def __init__(self, render, workers=None, depth=None):
+        self.render = render
+        self.workers = workers or EmailConfig.RENDER_WORKERS
+        self.depth = depth or EmailConfig.RENDER_QUEUE_DEPTH
+
+    def run(self, items):
+        """
+        Render every (key, item) pair in the background.
+        Yields (key, item, message, error) in input order; error is None on
+        success. Closing the generator early cancels outstanding renders.
+        """
+        stop = threading.Event()
+        pending = queue.Queue(maxsize=self.depth)
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        producer_errors = []
+
+        def put(entry):
+            """Block on the bounded queue until there is room or we stop."""
+            while not stop.is_set():
+                try:
+                    pending.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for key, item in items:
+                    future = executor.submit(self.render, item)
+                    if not put((key, item, future)):
+                        future.cancel()
+                        return
+            except Exception as e:
+                producer_errors.append(e)
+            finally:
+                put(_DONE)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                entry = pending.get()
+                if entry is _DONE:
+                    if producer_errors:
+                        raise producer_errors[0]
+                    break
+
+                key, item, future = entry
+                try:
+                    message, error = future.result(), None
+                except Exception as e:
+                    message, error = None, e
+
+                yield key, item, message, error
+
+        finally:
+            stop.set()
+
+            # Drop anything rendered ahead that will never be sent
+            while True:
+                try:
+                    entry = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not _DONE:
+                    entry[2].cancel()
+
+            executor.shutdown(wait=False, cancel_futures=True)
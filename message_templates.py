@@ -0,0 +1,170 @@
+"""
+Message Templates - Pre-Built MIME Bytes for Plain-Text Emails
+Follow-up emails only differ by recipient, sender, business name and a few
+per-message headers (Message-ID, threading), so each template is built
+through the email package once, with placeholder slots, and split into
+constant byte chunks. Rendering a lead just joins the chunks with its slot
+values (in a reused buffer) and base64-encodes them. Anything the fast path
+can't reproduce exactly falls back to a full build.
+"""
+
+import re
+import sys
+import base64
+import random
+import string
+import threading
+from collections import Counter
+from email.utils import make_msgid
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+MAX_HEADER_LINE = 78  # The email package folds header lines longer than this
+
+_MESSAGE_ID = re.compile(rb'^message-id:[ \t]*(<[^>\r\n]+>)', re.IGNORECASE | re.MULTILINE)
+
+
+def new_message_id(from_email):
+    """A fresh RFC 5322 Message-ID in the sender's domain."""
+    return make_msgid(domain=from_email.rsplit('@', 1)[-1])
+
+
+def new_boundary():
+    """A random MIME boundary in the email package's format (always the same length)."""
+    return '=' * 15 + '%0*d' % (len(repr(sys.maxsize - 1)), random.randrange(sys.maxsize)) + '=='
+
+
+def _field_count(template, name):
+    """How many times a str.format template uses the field `name`."""
+    return sum(field == name for _, field, _, _ in string.Formatter().parse(template))
+
+
+def read_message_id(message_body):
+    """Message-ID header of an encoded Gmail message body ('' if it has none)."""
+    raw = message_body.get('raw', '')
+
+    # Headers come first - decoding the start of the message is enough
+    head = base64.urlsafe_b64decode(raw[:4096])
+    headers = head.split(b'\n\n', 1)[0]
+    match = _MESSAGE_ID.search(headers)
+    if not match and len(raw) > 4096 and b'\n\n' not in head:
+        match = _MESSAGE_ID.search(base64.urlsafe_b64decode(raw).split(b'\n\n', 1)[0])
+
+    return match.group(1).decode('ascii') if match else ''
+
+
+class CompiledTemplate:
+    """One subject/body template, compiled to constant byte chunks and slots."""
+
+    def __init__(self, subject, body, headers=(), **constants):
+        self.subject = subject
+        self.body = body
+        self.headers = list(headers)  # Extra per-message headers, e.g. Message-ID
+        self.constants = constants
+        self.local = threading.local()  # Per-thread reusable buffer
+
+        # Placeholder values used while compiling; they survive MIME building untouched
+        self.slots = {'to': '@@SLOT_TO@@', 'from': '@@SLOT_FROM@@', 'business_name': '@@SLOT_NAME@@'}
+        for i, header in enumerate(self.headers):
+            self.slots[header] = f'@@SLOT_H{i}@@'
+
+        self.chunks = None  # [bytes, slot name, bytes, slot name, ...]
+        self.header_widths = {}  # slot -> fixed width of the header line holding it
+        self._compile()
+
+    def _build(self, to_email, from_email, business_name, headers=None, boundary=None):
+        """Full email-package build (the slow path)."""
+        message = MIMEMultipart(boundary=boundary)
+        message['to'] = to_email
+        message['from'] = from_email
+        message['subject'] = self.subject.format(business_name=business_name)
+        for header in self.headers:
+            message[header] = (headers or {})[header]
+
+        message.attach(MIMEText(
+            self.body.format(business_name=business_name, **self.constants), 'plain'
+        ))
+        return message.as_bytes()
+
+    def _compile(self):
+        """Build the message once with placeholders and split it at the slots."""
+        sample = self._build(
+            self.slots['to'], self.slots['from'], self.slots['business_name'],
+            headers={header: self.slots[header] for header in self.headers},
+            boundary=new_boundary()
+        )
+        boundary = re.search(rb'boundary="([^"]+)"', sample)
+        if not boundary:
+            return
+
+        names = {value.encode('ascii'): name for name, value in self.slots.items()}
+        pattern = re.compile(b'(' + b'|'.join(re.escape(p) for p in names) + b')')
+        parts = pattern.split(sample)
+
+        # Every placeholder must show up as often as the templates use it. A
+        # non-ASCII body is base64-encoded, hiding the slots inside it - no fast path
+        expected = Counter({name: 1 for name in self.slots})
+        expected['business_name'] = (
+            _field_count(self.subject, 'business_name') + _field_count(self.body, 'business_name')
+        )
+        if Counter(names[part] for part in parts[1::2]) != +expected:
+            return
+
+        # Each message gets its own boundary, filled in like a slot
+        self.chunks = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                self.chunks.append(names[part])
+                continue
+            for j, piece in enumerate(part.split(boundary.group(1))):
+                if j:
+                    self.chunks.append('boundary')
+                self.chunks.append(piece)
+
+        # Fixed width of each header line that holds a slot, to detect folding
+        header_block = sample.split(b'\n\n', 1)[0]
+        for line in header_block.split(b'\n'):
+            found = pattern.findall(line)
+            for placeholder in found:
+                width = len(line) - sum(len(p) for p in found)
+                name = names[placeholder]
+                self.header_widths[name] = max(self.header_widths.get(name, 0), width)
+
+    def _fits(self, values):
+        """True if the precompiled bytes are exactly what a full build would produce."""
+        boundary = values['boundary']
+        for name, value in values.items():
+            if name == 'boundary':
+                continue
+            if not value.isascii() or '\r' in value or '\n' in value or '@@SLOT_' in value:
+                return False
+            if boundary in value:
+                return False
+            if name in self.header_widths and \
+               self.header_widths[name] + len(value) > MAX_HEADER_LINE:
+                return False
+        return True
+
+    def render_bytes(self, to_email, from_email, business_name, headers=None):
+        """RFC 822 bytes for one recipient."""
+        values = {'to': to_email, 'from': from_email, 'business_name': business_name}
+        values.update(headers or {})
+        values['boundary'] = new_boundary()
+
+        if self.chunks is None or not self._fits(values):
+            return self._build(to_email, from_email, business_name, headers, values['boundary'])
+
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            buffer = self.local.buffer = bytearray()
+        buffer.clear()
+
+        encoded = {name: value.encode('ascii') for name, value in values.items()}
+        for chunk in self.chunks:
+            buffer += encoded[chunk] if isinstance(chunk, str) else chunk
+        return bytes(buffer)
+
+    def render(self, to_email, from_email, business_name, headers=None):
+        """Gmail API message body ({'raw': ...}) for one recipient."""
+        raw = self.render_bytes(to_email, from_email, business_name, headers)
+        return {'raw': base64.urlsafe_b64encode(raw).decode('ascii')}
@@ -0,0 +1,134 @@
+"""
+Quota Ledger - Shared Daily Send Counter
+SQLite-backed record of sends per account, per day and per message type.
+Increments are atomic across threads and processes, so the initial sender
+and the follow-up script can run at the same time without going over the
+Gmail limit. Workers reserve sends in blocks to avoid a round-trip per email.
+"""
+
+import threading
+from datetime import date
+
+from config_email import EmailConfig, FilePaths
+from sqlite_store import SQLiteStore
+
+
+class QuotaLedger(SQLiteStore):
+    """Atomic per-account, per-day, per-kind send counts."""
+
+    def __init__(self, path=None):
+        super().__init__(path or FilePaths.QUOTA_DB)
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sends (
+                    account TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (account, day, kind)
+                )
+            """)
+
+    def used(self, account, kind=None, day=None):
+        """Sends recorded today for an account (optionally one kind only)."""
+        day = day or str(date.today())
+        query = "SELECT COALESCE(SUM(count), 0) FROM sends WHERE account = ? AND day = ?"
+        params = [account, day]
+
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+
+        return self._connection().execute(query, params).fetchone()[0]
+
+    def try_consume(self, account, limit, kind, count=1):
+        """
+        Atomically take up to `count` sends from today's limit.
+        Returns how many were granted (0 once the account is at its limit).
+        """
+        conn = self._connection()
+        day = str(date.today())
+
+        # IMMEDIATE takes the write lock up front so check-and-increment is atomic
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            used = conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM sends WHERE account = ? AND day = ?",
+                (account, day)
+            ).fetchone()[0]
+
+            granted = max(0, min(count, limit - used))
+            if granted:
+                conn.execute("""
+                    INSERT INTO sends (account, day, kind, count) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (account, day, kind) DO UPDATE SET count = count + excluded.count
+                """, (account, day, kind, granted))
+
+            conn.execute("COMMIT")
+            return granted
+
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, account, kind, count):
+        """Give back sends that were taken but never used."""
+        if count <= 0:
+            return
+
+        self._connection().execute("""
+            UPDATE sends SET count = MAX(0, count - ?)
+            WHERE account = ? AND day = ? AND kind = ?
+        """, (count, account, str(date.today()), kind))
+
+    def reserve(self, account, limit, kind, block_size=None):
+        """Start a block reservation for a worker sending from `account`."""
+        return QuotaReservation(self, account, limit, kind, block_size)
+
+
+class QuotaReservation:
+    """
+    Sends drawn from the ledger in blocks and handed out locally.
+    Unused sends go back to the ledger on release(); a crash can strand at
+    most one block until the next day.
+    """
+
+    def __init__(self, ledger, account, limit, kind, block_size=None):
+        self.ledger = ledger
+        self.account = account
+        self.limit = limit
+        self.kind = kind
+        self.block_size = block_size or EmailConfig.QUOTA_RESERVE_BLOCK
+        self.held = 0  # Reserved in the ledger but not handed out yet
+        self.lock = threading.Lock()
+
+    def take(self, count):
+        """Hand out up to `count` sends, topping up from the ledger if needed."""
+        with self.lock:
+            if self.held < count:
+                self.held += self.ledger.try_consume(
+                    self.account, self.limit, self.kind,
+                    max(self.block_size, count - self.held)
+                )
+
+            granted = min(count, self.held)
+            self.held -= granted
+            return granted
+
+    def refund(self, count):
+        """Return sends that were handed out but not used (e.g. failed sends)."""
+        with self.lock:
+            self.held += count
+
+    def release(self):
+        """Return everything still held to the ledger."""
+        with self.lock:
+            self.ledger.release(self.account, self.kind, self.held)
+            self.held = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
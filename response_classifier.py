@@ -0,0 +1,153 @@
+"""
+Response Classifier - Keyword Scoring of Replies in One Pass
+The IGNORE/POSITIVE/NEGATIVE keyword lists from ResponseConfig are compiled
+once into a single regex. Keywords only match as whole words ("ok" doesn't
+hit inside "book"), longer phrases win over the words inside them ("not
+interested" isn't also counted as "interested"), and a phrase still matches
+when the reply wraps it over two lines or puts a comma between its words.
+"""
+
+from functools import lru_cache
+import re
+
+from config_email import ResponseConfig
+
+IGNORE = "IGNORE"
+POSITIVE = "YES"
+NEGATIVE = "NO"
+NEUTRAL = "MAYBE"
+
+# Bodies are matched as UTF-8 bytes in which every byte is either part of a
+# word (letters, ASCII ones lowercased, digits, _ ' - and non-ASCII) or a
+# space. One bytes.translate makes that form, and a keyword then always
+# starts after a space - a literal prefix the regex engine finds in C
+# instead of trying the whole pattern at every position
+_WORD_BYTES = set(b"abcdefghijklmnopqrstuvwxyz0123456789_'-") | set(range(128, 256))
+_CANONICAL = bytes(
+    byte if byte in _WORD_BYTES else byte + 32 if 65 <= byte <= 90 else 32
+    for byte in range(256)
+)
+_CURLY_APOSTROPHES = ('’'.encode('utf-8'), '‘'.encode('utf-8'))
+
+
+def _canonical(text):
+    """Canonical bytes of a body or keyword, padded with a space at both ends."""
+    raw = text.encode('utf-8')
+    for apostrophe in _CURLY_APOSTROPHES:
+        raw = raw.replace(apostrophe, b"'")
+    return b' ' + raw.translate(_CANONICAL) + b' '
+
+
+def _trie_pattern(keywords):
+    """
+    One regex alternation for canonical keywords (bytes), factored by
+    common prefix so each byte is tried once instead of once per keyword.
+    Optional tails are greedy, so the longest keyword wins.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for byte in keyword:
+            node = node.setdefault(byte, {})
+        node[None] = {}  # A keyword ends here
+
+    def pattern(node):
+        branches = []
+        for byte, child in sorted(node.items(), key=lambda item: -1 if item[0] is None else item[0]):
+            if byte is None:
+                continue
+            char = rb' +' if byte == 32 else re.escape(bytes([byte]))
+            branches.append(char + pattern(child))
+
+        if not branches:
+            return b''
+        alternation = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+        return b'(?:' + alternation + b')?' if None in node else alternation
+
+    return pattern(trie)
+
+
+class KeywordClassifier:
+    """Compiled IGNORE/POSITIVE/NEGATIVE keyword lists."""
+
+    def __init__(self, ignore_keywords, positive_keywords, negative_keywords):
+        # Earlier lists win if a keyword appears in more than one
+        self.categories = {}  # canonical keyword -> category
+        for category, keywords in (
+            (IGNORE, ignore_keywords),
+            (NEGATIVE, negative_keywords),
+            (POSITIVE, positive_keywords)
+        ):
+            for keyword in keywords:
+                canonical = b' '.join(_canonical(keyword).split())
+                if canonical:
+                    self.categories.setdefault(canonical, category)
+
+        # A keyword between spaces; the trailing one is left for the next match
+        self.pattern = re.compile(
+            rb' (' + _trie_pattern(self.categories) + rb')(?= )'
+        ) if self.categories else None
+
+    def _found(self, body_text):
+        """Distinct canonical keywords found in a body."""
+        found = set(self.pattern.findall(_canonical(body_text)))
+        if not found.issubset(self.categories):
+            # Wrapped line or punctuation between a phrase's words
+            found = {b' '.join(keyword.split()) for keyword in found}
+        return found
+
+    def matches(self, body_text):
+        """Distinct keywords found in a body, as {category: set of keywords}."""
+        found = {IGNORE: set(), POSITIVE: set(), NEGATIVE: set()}
+        if self.pattern is None or not body_text:
+            return found
+
+        for keyword in self._found(body_text):
+            found[self.categories[keyword]].add(keyword.decode('utf-8'))
+        return found
+
+    def classify(self, body_text):
+        """IGNORE for auto-replies, else YES/NO by keyword score, MAYBE on a tie."""
+        if self.pattern is None or not body_text:
+            return NEUTRAL
+
+        positive_score = negative_score = 0
+        for keyword in self._found(body_text):
+            category = self.categories[keyword]
+            if category == IGNORE:
+                return IGNORE
+            elif category == POSITIVE:
+                positive_score += 1
+            else:
+                negative_score += 1
+
+        if positive_score > negative_score:
+            return POSITIVE
+        elif negative_score > positive_score:
+            return NEGATIVE
+        else:
+            return NEUTRAL
+
+    def classify_all(self, bodies):
+        """Classify a list of bodies; returns their classifications in order."""
+        classify = self.classify
+        return [classify(body_text) for body_text in bodies]
+
+
+@lru_cache(maxsize=4)
+def _compile(ignore_keywords, positive_keywords, negative_keywords):
+    return KeywordClassifier(ignore_keywords, positive_keywords, negative_keywords)
+
+
+def response_classifier():
+    """Classifier for the current ResponseConfig keyword lists (compiled once)."""
+    return _compile(
+        tuple(ResponseConfig.IGNORE_KEYWORDS),
+        tuple(ResponseConfig.POSITIVE_KEYWORDS),
+        tuple(ResponseConfig.NEGATIVE_KEYWORDS)
+    )
+
+
+def classify_responses(bodies):
+    """Classify many reply bodies with one compiled classifier."""
+    return response_classifier().classify_all(bodies)
@@ -1,37 +1,132 @@
 """
 Response Tracker - Monitor Inbox for Replies
-Checks Gmail inbox and updates leads.csv when prospects respond.
+Updates leads.csv when prospects respond. Each run asks Gmail's history API
+only for messages added to the inbox since the last run, and matches them
+to leads by Gmail thread (or by sender, for leads emailed before thread ids
+were stored). The first run, or one whose sync point has expired, checks
+every recently contacted lead's thread and scans the inbox instead.
 """
 
 import os
+import re
 import sys
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from itertools import islice
 from colorama import init, Fore
+from googleapiclient.errors import HttpError
 
-from gmail_auth_helper import GmailAuthenticator
+from sender_pool import SenderPool
+from send_journal import SendJournal
+from lead_dedup import DUPLICATE, normalize_emails, registrable_domains, registrable_domain
+from followup_calendar import FollowUpCalendar, FOLLOWUP_COLUMNS, followup_schedule
+from inbox_sync import HistoryCursor
+from response_classifier import response_classifier, classify_responses
+from message_parts import message_text
+from message_cache import ProcessedMessageCache, NOT_A_LEAD, ALREADY_REPLIED, BOUNCE
+from bounces import BOUNCED, is_bounce, is_bounce_sender, bounced_recipients
 from config_email import (
-    CSVColumns, FilePaths, ResponseConfig, LogConfig
+    EmailConfig, CSVColumns, FilePaths, ResponseConfig, LogConfig
 )
 
 # Initialize colorama
 init(autoreset=True)
 
+# Addresses (or bare domains) that can go into a from:(...) search term as-is
+_SEARCHABLE_EMAIL = re.compile(r'^(?:[^\s()"{}@]+@)?[^\s()"{}@]+\.[^\s()"{}@]+$')
+
+# Host part of a website URL (without www.)
+_URL_HOST = re.compile(r'^(?:[a-z][a-z0-9+.-]*://)?(?:[^@/?#]*@)?(?:www\.)?([^/?#:]+)')
+
+
+def sender_queries(emails, base_query, max_chars=None):
+    """
+    Gmail searches of the form `<base_query> from:(a OR b OR ...)` covering
+    every address or domain, each kept under max_chars. Addresses that can't
+    be put in a search term are left out.
+    """
+    max_chars = max_chars or ResponseConfig.SEARCH_QUERY_MAX_CHARS
+    queries = []
+    terms = []
+    length = len(base_query) + len(' from:()')
+    
+    for email in sorted(set(emails)):
+        if not _SEARCHABLE_EMAIL.match(email):
+            continue
+        
+        added = len(email) + (len(' OR ') if terms else 0)
+        if terms and length + added > max_chars:
+            queries.append(f"{base_query} from:({' OR '.join(terms)})")
+            terms = []
+            length = len(base_query) + len(' from:()')
+            added = len(email)
+        
+        terms.append(email)
+        length += added
+    
+    if terms:
+        queries.append(f"{base_query} from:({' OR '.join(terms)})")
+    return queries
+
+
+def lead_address_index(df, excluded_domains=()):
+    """
+    Sender lookups for matching replies to leads, built column-wise:
+      emails  - lead email -> row
+      domains - registrable domain of a lead's email or website -> row,
+                for domains that belong to exactly one lead and aren't in
+                excluded_domains (free-mail and shared hosts)
+    Duplicates are left out - replies belong to the lead they were merged into.
+    """
+    leads = df[(df[CSVColumns.STATUS] != DUPLICATE).to_numpy()]
+    
+    emails = normalize_emails(leads[CSVColumns.EMAIL])
+    has_email = (emails != '').to_numpy()
+    email_index = dict(zip(emails[has_email], leads.index[has_email]))
+    
+    # Each lead's email host and website host
+    hosts = [email.rpartition('@')[2] if '@' in email else '' for email in emails.tolist()]
+    rows = leads.index.tolist()
+    if CSVColumns.URL in leads.columns:
+        for url, row in zip(leads[CSVColumns.URL].tolist(), leads.index):
+            match = _URL_HOST.match(url.strip().lower()) if isinstance(url, str) else None
+            if match:
+                hosts.append(match.group(1))
+                rows.append(row)
+    
+    # Resolve each distinct host once
+    hosts = pd.Series(hosts, dtype=object)
+    distinct = pd.Series(hosts.unique(), dtype=object)
+    domains = hosts.map(dict(zip(distinct, registrable_domains(distinct))))
+    
+    owners = pd.DataFrame({'domain': domains.to_numpy(), 'row': rows})
+    owners = owners[(owners['domain'] != '') & ~owners['domain'].isin(set(excluded_domains))]
+    owners = owners.drop_duplicates()
+    owners = owners[~owners['domain'].duplicated(keep=False)]  # Shared by several leads
+    
+    return email_index, dict(zip(owners['domain'], owners['row']))
+
 
 class ResponseTracker:
     """Tracks responses from leads in Gmail inbox."""
     
     def __init__(self):
-        self.authenticator = GmailAuthenticator()
-        self.service = None
+        self.pool = SenderPool()
+        self.service = None  # Service of the inbox currently being checked
+        self.journal = SendJournal()
+        self.calendar = FollowUpCalendar()
+        self.cursor = HistoryCursor()
+        self.message_cache = ProcessedMessageCache()
+        self.cancelled = set()  # Leads whose follow-ups stop once leads.csv is saved
         self.lead_emails = {}  # email -> index mapping
+        self.lead_domains = {}  # lead's own domain -> index, for replies from other addresses
     
     def connect(self):
         """Connect to Gmail API."""
         print(f"{Fore.CYAN}🔐 Connecting to Gmail API...")
-        self.service = self.authenticator.get_service()
         
-        if self.service:
+        if self.pool.connect():
+            self.service = self.pool.default.service
             print(f"{Fore.GREEN}✅ Connected successfully!")
             return True
         else:
@@ -46,64 +141,211 @@ class ResponseTracker:
         
         df = pd.read_csv(FilePaths.LEADS_CSV)
         
-        # Ensure response columns exist
-        if CSVColumns.RESPONSE not in df.columns:
-            df[CSVColumns.RESPONSE] = ''
-        if CSVColumns.RESPONSE_DATE not in df.columns:
-            df[CSVColumns.RESPONSE_DATE] = ''
-        if CSVColumns.RESPONSE_TEXT not in df.columns:
-            df[CSVColumns.RESPONSE_TEXT] = ''
+        # Ensure response, contact and threading columns exist
+        new_columns = {
+            CSVColumns.EMAIL_SENT: False,
+            CSVColumns.DATE_SENT: '',
+            CSVColumns.RESPONSE: '',
+            CSVColumns.RESPONSE_DATE: '',
+            CSVColumns.RESPONSE_TEXT: '',
+            CSVColumns.STATUS: 'Active',
+            CSVColumns.SENDER_ACCOUNT: '',
+            CSVColumns.GMAIL_THREAD_ID: ''
+        }
+        for col in FOLLOWUP_COLUMNS:
+            new_columns[col] = ''
+        
+        for col, default_val in new_columns.items():
+            if col not in df.columns:
+                df[col] = default_val
         
-        # Build email index for fast lookup
-        for idx, row in df.iterrows():
-            if pd.notna(row[CSVColumns.EMAIL]) and row[CSVColumns.EMAIL]:
-                email = row[CSVColumns.EMAIL].lower().strip()
-                self.lead_emails[email] = idx
+        # Apply send results not yet folded into the CSV
+        df = self.journal.replay(df)
+        
+        # Build email and domain indexes for fast lookup
+        self.lead_emails, self.lead_domains = lead_address_index(df, self.shared_domains())
         
         print(f"{Fore.CYAN}📊 Loaded {len(df)} leads ({len(self.lead_emails)} with emails)")
         
         return df
     
-    def get_recent_messages(self, days_back=7):
-        """Get messages from inbox from last N days."""
-        try:
-            # Calculate date for query
-            after_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
-            
-            # Query inbox
-            query = f'in:inbox after:{after_date}'
+    def shared_domains(self):
+        """Domains that don't identify a lead: free mail, shared hosts and our own."""
+        own = [account.email.lower().rsplit('@', 1)[-1] for account in self.pool.accounts]
+        return set(ResponseConfig.FREE_MAIL_DOMAINS) | set(EmailConfig.DEDUP_SHARED_DOMAINS) | set(own)
+    
+    def match_sender(self, from_email, lead_emails, lead_domains):
+        """Row of the lead a sender belongs to: exact address, else the lead's own domain."""
+        if not from_email:
+            return None
+        if from_email in lead_emails:
+            return lead_emails[from_email]
+        if lead_domains and '@' in from_email:
+            return lead_domains.get(registrable_domain(from_email.rsplit('@', 1)[1]))
+        return None
+    
+    def list_pages(self, list_call, **params):
+        """
+        Yield each page of a paginated Gmail list call, following
+        nextPageToken. The next page is only requested once the caller has
+        worked through the current one.
+        """
+        page_token = None
+        
+        while True:
+            page = list_call(userId='me', pageToken=page_token, **params).execute()
+            yield page
             
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=500  # Adjust if needed
-            ).execute()
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def search_messages(self, queries, failed=None):
+        """
+        Yield {'id', 'threadId'} of messages matching any of `queries`.
+        The queries run side by side: each round fetches the next page of
+        every unfinished query in batch requests (up to FETCH_BATCH_SIZE
+        queries each), and the caller works through a round's messages
+        before the next round is requested.
+        Queries whose listing failed (and so were cut short) are added to `failed`.
+        """
+        next_pages = {str(i): None for i in range(len(queries))}  # query -> page token
+        failed = failed if failed is not None else set()
+        
+        while next_pages:
+            pages = {}
             
-            messages = results.get('messages', [])
+            def callback(request_id, response, exception):
+                if exception is not None:
+                    print(f"{Fore.RED}❌ Error fetching messages: {exception}")
+                    failed.add(queries[int(request_id)])
+                else:
+                    pages[request_id] = response
             
-            print(f"{Fore.CYAN}📬 Found {len(messages)} messages in last {days_back} days")
+            keys = list(next_pages)
+            for start in range(0, len(keys), ResponseConfig.FETCH_BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=callback)
+                for key in keys[start:start + ResponseConfig.FETCH_BATCH_SIZE]:
+                    batch.add(
+                        self.service.users().messages().list(
+                            userId='me',
+                            q=queries[int(key)],
+                            maxResults=500,
+                            pageToken=next_pages[key]
+                        ),
+                        request_id=key
+                    )
+                
+                try:
+                    batch.execute()
+                except Exception as e:
+                    print(f"{Fore.RED}❌ Error fetching messages: {e}")
+                    failed.update(queries[int(key)] for key in keys[start:start + ResponseConfig.FETCH_BATCH_SIZE]
+                                  if key not in pages)
             
-            return messages
+            next_pages = {}
+            for key, page in pages.items():
+                yield from page.get('messages', [])
+                if page.get('nextPageToken'):
+                    next_pages[key] = page['nextPageToken']
+    
+    def get_recent_messages(self, days_back=7, senders=None, bounces=False, failed=None):
+        """
+        Yield {'id', 'threadId'} of inbox messages from the last N days,
+        page by page. With `senders`, Gmail only returns messages from those
+        addresses (searched in shards that fit Gmail's query length), plus
+        bounce notices if `bounces` is set.
+        Queries that couldn't be listed in full are added to `failed`.
+        """
+        # Calculate date for query
+        after_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
+        
+        # Query inbox
+        query = f'in:inbox after:{after_date}'
+        
+        if senders is not None:
+            queries = sender_queries(senders, query)
+            if bounces:
+                queries.append(f'{query} from:(mailer-daemon OR postmaster)')
+            yield from self.search_messages(queries, failed)
+            return
+        
+        try:
+            for page in self.list_pages(self.service.users().messages().list, q=query, maxResults=500):
+                yield from page.get('messages', [])
         
         except Exception as e:
             print(f"{Fore.RED}❌ Error fetching messages: {e}")
-            return []
+            if failed is not None:
+                failed.add(query)
     
-    def get_message_details(self, message_id):
-        """Get full message details."""
+    def get_history_messages(self, start_history_id):
+        """
+        Messages added to the inbox since `start_history_id`, and the latest
+        history id. Returns (None, None) if Gmail no longer has that history.
+        """
+        messages = []
+        history_id = start_history_id
+        
         try:
-            message = self.service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'
-            ).execute()
-            
-            return message
+            for page in self.list_pages(
+                self.service.users().history().list,
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX'
+            ):
+                for record in page.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        messages.append(added['message'])
+                history_id = page.get('historyId', history_id)
+        
+        except HttpError as e:
+            if e.resp.status == 404:
+                return None, None  # Too old - Gmail keeps about a week of history
+            raise
         
+        return messages, history_id
+    
+    def get_history_id(self):
+        """The mailbox's current history id (where the next sync starts)."""
+        try:
+            return self.service.users().getProfile(userId='me').execute()['historyId']
         except Exception as e:
-            print(f"{Fore.YELLOW}⚠️  Error fetching message {message_id}: {e}")
+            print(f"{Fore.YELLOW}⚠️  Error reading mailbox history id: {e}")
             return None
     
+    def fetch_messages(self, message_ids, **params):
+        """
+        Get many messages in BatchHttpRequest groups of FETCH_BATCH_SIZE.
+        params go to messages().get (format, metadataHeaders, ...).
+        Returns {message id: message}; messages that failed are left out.
+        """
+        fetched = {}
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                print(f"{Fore.YELLOW}⚠️  Error fetching message {request_id}: {exception}")
+            else:
+                fetched[request_id] = response
+        
+        message_ids = list(dict.fromkeys(message_ids))  # Batch request ids must be unique
+        size = ResponseConfig.FETCH_BATCH_SIZE
+        
+        for start in range(0, len(message_ids), size):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for message_id in message_ids[start:start + size]:
+                batch.add(
+                    self.service.users().messages().get(userId='me', id=message_id, **params),
+                    request_id=message_id
+                )
+            
+            try:
+                batch.execute()
+            except Exception as e:
+                print(f"{Fore.YELLOW}⚠️  Error fetching messages: {e}")
+        
+        return fetched
+    
     def extract_email_from_header(self, headers, header_name):
         """Extract email address from message headers."""
         for header in headers:
@@ -116,138 +358,375 @@ class ResponseTracker:
         return None
     
     def get_message_body(self, payload):
-        """Extract message body text."""
+        """Extract message body text (plain text, else HTML as text)."""
         try:
-            if 'parts' in payload:
-                for part in payload['parts']:
-                    if part['mimeType'] == 'text/plain':
-                        if 'data' in part['body']:
-                            import base64
-                            return base64.urlsafe_b64decode(
-                                part['body']['data']
-                            ).decode('utf-8', errors='ignore')
-            
-            elif 'body' in payload and 'data' in payload['body']:
-                import base64
-                return base64.urlsafe_b64decode(
-                    payload['body']['data']
-                ).decode('utf-8', errors='ignore')
-            
-            return ""
+            return message_text(payload)
         
         except Exception as e:
             return ""
     
     def classify_response(self, body_text):
-        """Classify response as positive/negative/neutral."""
-        if not body_text:
-            return "MAYBE"
+        """Classify response as positive/negative/neutral (IGNORE for auto-replies)."""
+        return response_classifier().classify(body_text)
+    
+    def awaiting_reply(self, df):
+        """Mask of leads contacted within THREAD_LOOKBACK_DAYS that haven't replied."""
+        cutoff = pd.Timestamp(date.today() - timedelta(days=ResponseConfig.THREAD_LOOKBACK_DAYS))
+        last_contact = followup_schedule(df)['last_contact']
+        response = df[CSVColumns.RESPONSE]
+        
+        return (
+            (df[CSVColumns.EMAIL_SENT] == True).to_numpy()
+            & (response.isna() | (response == '')).to_numpy()
+            & ~df[CSVColumns.STATUS].isin(EmailConfig.SUPPRESSED_STATUSES + [DUPLICATE]).to_numpy()
+            & (last_contact >= cutoff).to_numpy()
+        )
+    
+    def record_response(self, df, lead_idx, from_email, body_text, response_type=None):
+        """Classify a reply and record it on the lead. Returns False for auto-replies."""
+        # Classify response
+        response_type = response_type or self.classify_response(body_text)
         
-        body_lower = body_text.lower()
+        # Skip auto-replies
+        if response_type == "IGNORE":
+            return False
         
-        # Check for auto-replies/bounces (ignore these)
-        for keyword in ResponseConfig.IGNORE_KEYWORDS:
-            if keyword in body_lower:
-                return "IGNORE"
+        # Record response
+        business_name = df.loc[lead_idx, CSVColumns.BUSINESS_NAME]
         
-        # Check for positive response
-        positive_score = sum(1 for keyword in ResponseConfig.POSITIVE_KEYWORDS 
-                            if keyword in body_lower)
+        print(f"{Fore.GREEN}✉️  Response from: {business_name}")
+        print(f"   Email: {from_email}")
+        print(f"   Type: {response_type}")
+        print(f"   Preview: {body_text[:80]}...")
+        print()
         
-        # Check for negative response
-        negative_score = sum(1 for keyword in ResponseConfig.NEGATIVE_KEYWORDS 
-                            if keyword in body_lower)
+        # Update CSV
+        df.loc[lead_idx, CSVColumns.RESPONSE] = response_type
+        df.loc[lead_idx, CSVColumns.RESPONSE_DATE] = datetime.now().strftime("%Y-%m-%d")
+        df.loc[lead_idx, CSVColumns.RESPONSE_TEXT] = body_text[:100]  # First 100 chars
         
-        if positive_score > negative_score:
-            return "YES"
-        elif negative_score > positive_score:
-            return "NO"
+        # Update status
+        if response_type == "YES":
+            df.loc[lead_idx, CSVColumns.STATUS] = "Responded-Interested"
+        elif response_type == "NO":
+            df.loc[lead_idx, CSVColumns.STATUS] = "Responded-NotInterested"
+            # Check for unsubscribe
+            if 'unsubscribe' in body_text.lower():
+                df.loc[lead_idx, CSVColumns.STATUS] = "Unsubscribed"
         else:
-            return "MAYBE"
+            df.loc[lead_idx, CSVColumns.STATUS] = "Responded-Neutral"
+        
+        # No more follow-ups once they've replied (cancelled after leads.csv is saved)
+        self.cancelled.add(lead_idx)
+        
+        return True
     
-    def process_responses(self, df):
-        """Check inbox and update responses."""
-        # Get recent messages
-        messages = self.get_recent_messages(days_back=14)  # Check last 2 weeks
+    def mark_bounced(self, df, addresses):
+        """Mark every lead at a bounced address as Bounced, in one update. Returns how many."""
+        if not addresses:
+            return 0
         
-        if not messages:
-            print(f"{Fore.YELLOW}No messages to process.")
-            return df
+        bounced = (
+            normalize_emails(df[CSVColumns.EMAIL]).isin(addresses).to_numpy()
+            & ~df[CSVColumns.STATUS].isin(EmailConfig.SUPPRESSED_STATUSES + [DUPLICATE]).to_numpy()
+        )
+        df.loc[bounced, CSVColumns.STATUS] = BOUNCED
         
-        responses_found = 0
-        new_responses = 0
+        # No more follow-ups to a dead address
+        self.cancelled.update(df.index[bounced])
         
-        print(f"\n{Fore.CYAN}🔍 Checking messages for responses...\n")
+        return int(bounced.sum())
+    
+    def process_threads(self, df, thread_ids, stats):
+        """
+        Look up each lead's own Gmail thread and record the first real reply.
+        Returns the ids of threads that couldn't be read.
+        """
+        print(f"{Fore.CYAN}🧵 Checking {len(thread_ids)} active threads for replies...\n")
+        bounces = []
+        failed = set()
         
-        for msg in messages:
+        for lead_idx, thread_id in thread_ids.items():
             try:
-                # Get message details
-                message = self.get_message_details(msg['id'])
+                thread = self.service.users().threads().get(
+                    userId='me',
+                    id=thread_id,
+                    format='full'
+                ).execute()
                 
+                for message in thread.get('messages', []):
+                    # Anything we didn't send ourselves is a reply
+                    if 'SENT' in message.get('labelIds', []):
+                        continue
+                    
+                    # Bounces of our email land in its thread
+                    if is_bounce(message):
+                        bounces.append(message)
+                        continue
+                    
+                    headers = message['payload']['headers']
+                    from_email = self.extract_email_from_header(headers, 'From')
+                    body_text = self.get_message_body(message['payload'])
+                    
+                    if self.record_response(df, lead_idx, from_email, body_text):
+                        stats['new'] += 1
+                        break
+            
+            except Exception as e:
+                if LogConfig.LOG_TO_CONSOLE:
+                    print(f"{Fore.YELLOW}⚠️  Error checking thread {thread_id}: {e}")
+                failed.add(thread_id)
+                continue
+        
+        stats['bounced'] |= bounced_recipients(bounces)
+        return failed
+    
+    def has_response(self, df, lead_idx):
+        """True if a response is already recorded for this lead."""
+        response = df.loc[lead_idx, CSVColumns.RESPONSE]
+        return bool(pd.notna(response) and response)
+    
+    def process_messages(self, df, messages, lead_emails, lead_domains, thread_leads, stats):
+        """
+        Record replies among `messages` (each {'id', 'threadId'}): messages in
+        a lead's thread (thread_leads: thread id -> row), and messages sent
+        from a lead's address (lead_emails: email -> row) or from another
+        address at its domain (lead_domains: domain -> row). `messages` may be
+        a generator; it is consumed as it goes.
+        Messages are fetched in batches: senders first (metadata only), then
+        full bodies for just the messages that can be from a lead. Messages
+        handled on an earlier run are in the message cache and not fetched.
+        Addresses that bounced are added to stats['bounced'].
+        Returns (how many were seen, ids of messages that couldn't be fetched
+        or processed) - those aren't cached, so a later pass reads them again.
+        """
+        seen = 0
+        failed = set()
+        messages = iter(messages)
+        
+        while True:
+            chunk = list(islice(messages, ResponseConfig.FETCH_BATCH_SIZE))
+            if not chunk:
+                return seen, failed
+            seen += len(chunk)
+            
+            processed = self.message_cache.seen(msg['id'] for msg in chunk)
+            chunk = [msg for msg in chunk if msg['id'] not in processed]
+            
+            # Messages in a lead's own thread need no sender check
+            candidates = {}  # message id -> lead row
+            unknown = []
+            for msg in chunk:
+                lead_idx = thread_leads.get(msg.get('threadId'))
+                if lead_idx is not None:
+                    candidates[msg['id']] = lead_idx
+                else:
+                    unknown.append(msg['id'])
+            
+            # Phase 1: just the From header of everything else
+            headers_only = self.fetch_messages(unknown, format='metadata', metadataHeaders=['From'])
+            bounce_ids = []
+            for message_id in unknown:
+                message = headers_only.get(message_id)
                 if not message:
+                    failed.add(message_id)
                     continue
                 
-                headers = message['payload']['headers']
-                
-                # Get sender email
-                from_email = self.extract_email_from_header(headers, 'From')
-                
-                if not from_email:
-                    continue
-                
-                # Check if this is from a lead
-                if from_email not in self.lead_emails:
-                    continue
-                
-                lead_idx = self.lead_emails[from_email]
+                from_email = self.extract_email_from_header(message['payload'].get('headers', []), 'From')
+                lead_idx = self.match_sender(from_email, lead_emails, lead_domains)
+                if 'SENT' in message.get('labelIds', []):
+                    self.message_cache.record(message_id, from_email, NOT_A_LEAD)
+                elif lead_idx is not None:
+                    candidates[message_id] = lead_idx
+                elif is_bounce_sender(from_email):
+                    bounce_ids.append(message_id)
+                else:
+                    self.message_cache.record(message_id, from_email, NOT_A_LEAD)
+            
+            for message_id, lead_idx in list(candidates.items()):
+                if self.has_response(df, lead_idx):
+                    self.message_cache.record(message_id, None, ALREADY_REPLIED)
+                    del candidates[message_id]
+            if not candidates and not bounce_ids:
+                continue
+            
+            # Phase 2: full bodies, only for possible replies and bounces
+            full = self.fetch_messages(list(candidates) + bounce_ids, format='full')
+            bounces = {message_id: full[message_id] for message_id in bounce_ids if message_id in full}
+            failed.update(message_id for message_id in bounce_ids if message_id not in full)
+            replies = []  # (message id, lead row, sender, body text)
+            for message_id, lead_idx in candidates.items():
+                try:
+                    message = full.get(message_id)
+                    if not message:
+                        failed.add(message_id)
+                        continue
+                    
+                    from_email = self.extract_email_from_header(message['payload']['headers'], 'From')
+                    if 'SENT' in message.get('labelIds', []):
+                        self.message_cache.record(message_id, from_email, NOT_A_LEAD)
+                        continue
+                    
+                    # Bounces of our email land in its thread
+                    if is_bounce(message):
+                        bounces[message_id] = message
+                        continue
+                    
+                    replies.append((message_id, lead_idx, from_email, self.get_message_body(message['payload'])))
                 
-                # Skip if we already recorded a response
-                if pd.notna(df.loc[lead_idx, CSVColumns.RESPONSE]) and \
-                   df.loc[lead_idx, CSVColumns.RESPONSE]:
-                    responses_found += 1
+                except Exception as e:
+                    if LogConfig.LOG_TO_CONSOLE:
+                        print(f"{Fore.YELLOW}⚠️  Error processing message: {e}")
+                    failed.add(message_id)
                     continue
+            
+            # Classify the batch's replies together, then record them in order
+            response_types = classify_responses([body_text for _, _, _, body_text in replies])
+            for (message_id, lead_idx, from_email, body_text), response_type in zip(replies, response_types):
+                try:
+                    # A lead can reply more than once - the first one counts
+                    if self.has_response(df, lead_idx):
+                        self.message_cache.record(message_id, from_email, ALREADY_REPLIED)
+                        continue
+                    
+                    if self.record_response(df, lead_idx, from_email, body_text, response_type):
+                        stats['new'] += 1
+                    self.message_cache.record(message_id, from_email, response_type, body_text)
                 
-                # Get message body
-                body_text = self.get_message_body(message['payload'])
-                
-                # Classify response
-                response_type = self.classify_response(body_text)
-                
-                # Skip auto-replies
-                if response_type == "IGNORE":
+                except Exception as e:
+                    if LogConfig.LOG_TO_CONSOLE:
+                        print(f"{Fore.YELLOW}⚠️  Error processing message: {e}")
+                    failed.add(message_id)
                     continue
-                
-                # Record response
-                business_name = df.loc[lead_idx, CSVColumns.BUSINESS_NAME]
-                
-                print(f"{Fore.GREEN}✉️  Response from: {business_name}")
-                print(f"   Email: {from_email}")
-                print(f"   Type: {response_type}")
-                print(f"   Preview: {body_text[:80]}...")
-                print()
-                
-                # Update CSV
-                df.loc[lead_idx, CSVColumns.RESPONSE] = response_type
-                df.loc[lead_idx, CSVColumns.RESPONSE_DATE] = datetime.now().strftime("%Y-%m-%d")
-                df.loc[lead_idx, CSVColumns.RESPONSE_TEXT] = body_text[:100]  # First 100 chars
-                
-                # Update status
-                if response_type == "YES":
-                    df.loc[lead_idx, CSVColumns.STATUS] = "Responded-Interested"
-                elif response_type == "NO":
-                    df.loc[lead_idx, CSVColumns.STATUS] = "Responded-NotInterested"
-                    # Check for unsubscribe
-                    if 'unsubscribe' in body_text.lower():
-                        df.loc[lead_idx, CSVColumns.STATUS] = "Unsubscribed"
-                else:
-                    df.loc[lead_idx, CSVColumns.STATUS] = "Responded-Neutral"
-                
-                new_responses += 1
             
-            except Exception as e:
-                if LogConfig.LOG_TO_CONSOLE:
-                    print(f"{Fore.YELLOW}⚠️  Error processing message: {e}")
+            stats['bounced'] |= bounced_recipients(bounces.values())
+            for message_id in bounces:
+                self.message_cache.record(message_id, None, BOUNCE)
+    
+    def process_inbox(self, df, lead_emails, lead_domains, stats):
+        """
+        Scan the current inbox for replies from `lead_emails` or `lead_domains`.
+        Returns the searches that failed and the ids of messages that
+        couldn't be fetched or processed.
+        """
+        print(f"\n{Fore.CYAN}🔍 Checking messages for responses...\n")
+        
+        # Only mail from these leads is listed; it's processed while later
+        # pages are still being listed
+        failed_searches = set()
+        messages = self.get_recent_messages(
+            days_back=ResponseConfig.INBOX_SCAN_DAYS,
+            senders=list(lead_emails) + list(lead_domains),
+            bounces=True,
+            failed=failed_searches
+        )
+        seen, failed = self.process_messages(df, messages, lead_emails, lead_domains, {}, stats)
+        
+        if seen:
+            print(f"{Fore.CYAN}📬 Checked {seen} messages from the last {ResponseConfig.INBOX_SCAN_DAYS} days")
+        else:
+            print(f"{Fore.YELLOW}No messages to process.")
+        return failed | failed_searches
+    
+    def sync_inbox(self, account, df, thread_leads, lead_emails, lead_domains, stats):
+        """
+        Process messages added to an account's inbox since its last sync.
+        Returns False if there is no usable sync point (a full check is needed).
+        """
+        start = self.cursor.get(account.email)
+        if not start:
+            return False
+        
+        try:
+            messages, history_id = self.get_history_messages(start)
+        except Exception as e:
+            # Leave the sync point where it is and try again next run
+            print(f"{Fore.RED}❌ Error reading inbox history: {e}")
+            return True
+        
+        if messages is None:
+            print(f"{Fore.YELLOW}⚠️  Sync point expired - checking threads and inbox in full")
+            return False
+        
+        print(f"{Fore.CYAN}📬 {len(messages)} new inbox messages since the last check")
+        _, failed = self.process_messages(df, messages, lead_emails, lead_domains, thread_leads, stats)
+        
+        # Messages we couldn't read must be listed again - keep the sync point.
+        # The rest are in the message cache and won't be fetched twice
+        if failed:
+            print(f"{Fore.YELLOW}⚠️  {len(failed)} messages couldn't be read - they'll be checked again next run")
+        else:
+            self.cursor.advance(account.email, history_id)
+        return True
+    
+    def process_responses(self, df):
+        """Check every sending account's inbox and update responses."""
+        stats = {'new': 0, 'bounced': set()}
+        response = df[CSVColumns.RESPONSE]
+        responses_found = int((response.notna() & (response != '')).sum())
+        
+        # Only leads still waiting on a reply need checking
+        waiting = df[self.awaiting_reply(df)]
+        owners = waiting[CSVColumns.SENDER_ACCOUNT].fillna('').replace('', self.pool.default.email)
+        thread_ids = waiting[CSVColumns.GMAIL_THREAD_ID].fillna('').astype(str).str.strip()
+        
+        # Any reply in the thread of a lead that hasn't answered counts, however old
+        open_leads = df[
+            (response.isna() | (response == '')).to_numpy()
+            & ~df[CSVColumns.STATUS].isin(EmailConfig.SUPPRESSED_STATUSES + [DUPLICATE]).to_numpy()
+        ]
+        open_owners = open_leads[CSVColumns.SENDER_ACCOUNT].fillna('').replace('', self.pool.default.email)
+        open_threads = open_leads[CSVColumns.GMAIL_THREAD_ID].fillna('').astype(str).str.strip()
+        
+        # Replies land in the mailbox that contacted the lead
+        for account in self.pool.accounts:
+            if account.service is None:
                 continue
+            
+            mine = (owners == account.email).to_numpy()
+            threaded = mine & (thread_ids != '').to_numpy()
+            
+            # Every waiting lead is matched by sender too: threaded leads can
+            # answer in a new thread or from a colleague's address
+            my_rows = set(waiting.index[mine])
+            lead_emails = {
+                email: idx for email, idx in self.lead_emails.items()
+                if idx in my_rows
+            }
+            lead_domains = {
+                domain: idx for domain, idx in self.lead_domains.items()
+                if idx in my_rows
+            }
+            
+            print(f"\n{Fore.CYAN}📥 Inbox: {account.email}")
+            self.service = account.service
+            
+            # Usually just the inbox changes since the last run; a message in
+            # a lead's thread skips the sender lookup
+            tracked = ((open_owners == account.email) & (open_threads != '')).to_numpy()
+            thread_leads = {thread_id: idx for idx, thread_id in open_threads[tracked].items()}
+            if self.sync_inbox(account, df, thread_leads, lead_emails, lead_domains, stats):
+                continue
+            
+            # Full check - where the next sync will start from
+            history_id = self.get_history_id()
+            
+            # One threads().get per active conversation
+            failed = set()
+            if threaded.any():
+                failed |= self.process_threads(df, thread_ids[threaded].to_dict(), stats)
+            
+            if lead_emails or lead_domains:
+                failed |= self.process_inbox(df, lead_emails, lead_domains, stats)
+            
+            # Only sync from here on once everything up to here was read
+            if failed:
+                print(f"{Fore.YELLOW}⚠️  {len(failed)} threads, messages or searches couldn't be read - they'll be checked again next run")
+            else:
+                self.cursor.advance(account.email, history_id)
+        
+        new_responses = stats['new']
+        bounced = self.mark_bounced(df, stats['bounced'])
         
         # Summary
         print(f"{Fore.CYAN}{'='*70}")
@@ -255,6 +734,8 @@ class ResponseTracker:
         print(f"{Fore.CYAN}{'='*70}")
         print(f"{Fore.GREEN}✉️  New responses: {new_responses}")
         print(f"{Fore.CYAN}📧 Total responses tracked: {responses_found + new_responses}")
+        if bounced:
+            print(f"{Fore.RED}📭 Bounced (no more emails): {bounced}")
         
         # Breakdown by type
         if new_responses > 0:
@@ -294,8 +775,14 @@ def main():
     # Process responses
     df_updated = tracker.process_responses(df)
     
-    # Save
-    df_updated.to_csv(FilePaths.LEADS_CSV, index=False)
+    # Save (also folds any pending send journal into leads.csv)
+    tracker.journal.compact(df_updated)
+    
+    # Now that these replies are saved: next run picks up from here, and
+    # their follow-ups are cancelled
+    tracker.cursor.save()
+    tracker.message_cache.save()
+    tracker.calendar.cancel_all(tracker.cancelled)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+"""
+Retry Queue - Durable Storage for Messages That Couldn't Be Sent Yet
+Rate-limited and transiently failed messages are parked here (already
+rendered) with the time they may be retried. The send engine drains due
+entries before new work, during the same run or the next one.
+Also provides the circuit breaker used for 5xx and network errors.
+"""
+
+import json
+import time
+
+from colorama import Fore
+
+from config_email import EmailConfig, FilePaths
+from sqlite_store import SQLiteStore
+
+
+class RetryQueue(SQLiteStore):
+    """SQLite-backed queue of rendered messages waiting to be retried."""
+
+    def __init__(self, path=None):
+        super().__init__(path or FilePaths.RETRY_QUEUE_DB)
+
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS retries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                lead_key INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                not_before REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        self._connection().execute(
+            "CREATE INDEX IF NOT EXISTS retries_due ON retries (account, kind, not_before)"
+        )
+
+    def push(self, account, kind, key, message_body, delay, error, attempts=1):
+        """Park a message to be retried after `delay` seconds."""
+        self._connection().execute("""
+            INSERT INTO retries (account, kind, lead_key, message, attempts, not_before, last_error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (account, kind, int(key), json.dumps(message_body), attempts,
+              time.time() + delay, str(error)[:200]))
+
+    def due(self, account, kind, limit):
+        """
+        Up to `limit` entries whose retry time has come, oldest first.
+        Returns a list of (entry_id, key, message_body, attempts).
+        """
+        rows = self._connection().execute("""
+            SELECT id, lead_key, message, attempts FROM retries
+            WHERE account = ? AND kind = ? AND not_before <= ?
+            ORDER BY not_before LIMIT ?
+        """, (account, kind, time.time(), limit)).fetchall()
+
+        return [(entry_id, key, json.loads(message), attempts)
+                for entry_id, key, message, attempts in rows]
+
+    def pending(self, account=None, kind=None):
+        """Number of parked messages (optionally for one account/kind)."""
+        query = "SELECT COUNT(*) FROM retries WHERE 1 = 1"
+        params = []
+        if account:
+            query += " AND account = ?"
+            params.append(account)
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        return self._connection().execute(query, params).fetchone()[0]
+
+    def parked_keys(self, kind):
+        """Lead keys with a message of this kind waiting in the queue."""
+        rows = self._connection().execute(
+            "SELECT DISTINCT lead_key FROM retries WHERE kind = ?", (kind,)
+        ).fetchall()
+        return {key for key, in rows}
+
+    def discard(self, kind, keys):
+        """Drop every message of this kind parked for the given lead keys."""
+        self._connection().executemany(
+            "DELETE FROM retries WHERE kind = ? AND lead_key = ?",
+            [(kind, int(key)) for key in keys]
+        )
+
+    def reschedule(self, entry_id, delay, error):
+        """Push an entry back after another failed attempt."""
+        self._connection().execute("""
+            UPDATE retries SET attempts = attempts + 1, not_before = ?, last_error = ?
+            WHERE id = ?
+        """, (time.time() + delay, str(error)[:200], entry_id))
+
+    def remove(self, entry_id):
+        """Drop an entry (sent, or given up on)."""
+        self._connection().execute("DELETE FROM retries WHERE id = ?", (entry_id,))
+
+
+class CircuitBreaker:
+    """
+    Stops hammering Gmail during outages. After `threshold` consecutive
+    transient failures the circuit opens for `cooldown` seconds; the next
+    batch after that is a trial (half-open) that closes it on success.
+    """
+
+    def __init__(self, threshold=None, cooldown=None):
+        self.threshold = threshold or EmailConfig.CIRCUIT_FAILURE_THRESHOLD
+        self.cooldown = cooldown or EmailConfig.CIRCUIT_COOLDOWN_SECONDS
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold and not self.is_open:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            print(f"{Fore.RED}  ⚡ Circuit open after {self.failures} transient failures")
+
+    def wait_until_half_open(self):
+        """Sleep out the rest of the cooldown before a trial batch."""
+        if not self.is_open:
+            return
+
+        remaining = self.cooldown - (time.monotonic() - self.opened_at)
+        if remaining > 0:
+            print(f"{Fore.YELLOW}  ⏳ Circuit open - retrying in {remaining:.0f} seconds...")
+            time.sleep(remaining)
+
+        # Half-open: one more failure re-opens it immediately
+        self.failures = self.threshold - 1
+        self.opened_at = None
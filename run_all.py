@@ -1,6 +1,6 @@
 """
 Master Orchestrator - Run Complete Lead Gen Pipeline
-Runs all components in sequence: Research → Send → Track → Follow-up
+Runs all components in sequence: Research → Track → Send (initial + follow-ups)
 """
 
 import os
@@ -57,6 +57,7 @@ def check_prerequisites():
         'email_sender.py',
         'response_tracker.py',
         'follow_up.py',
+        'send_scheduler.py',
         'config_email.py'
     ]
     
@@ -106,35 +107,21 @@ def main():
         print(f"{Fore.CYAN}Skipping lead research (using existing leads.csv)")
         results['Research'] = 'Skipped'
     
-    # Delay before sending
-    print(f"\n{Fore.CYAN}⏳ Waiting 10 seconds before sending emails...")
-    time.sleep(10)
-    
-    # Step 2: Send Initial Emails
-    success = run_script('email_sender.py', 'STEP 2: Send Initial Emails')
-    results['Email Sending'] = success
-    
-    if not success:
-        print(f"\n{Fore.YELLOW}⚠️  Email sending encountered issues.")
-        proceed = input(f"{Fore.YELLOW}Continue to tracking? (yes/no): ").strip().lower()
-        if proceed != 'yes':
-            return
-    
     # Delay before checking responses
     print(f"\n{Fore.CYAN}⏳ Waiting 5 seconds before checking responses...")
     time.sleep(5)
     
-    # Step 3: Track Responses
-    success = run_script('response_tracker.py', 'STEP 3: Track Responses')
+    # Step 2: Track Responses (so nobody who replied gets a follow-up)
+    success = run_script('response_tracker.py', 'STEP 2: Track Responses')
     results['Response Tracking'] = success
     
-    # Delay before follow-ups
-    print(f"\n{Fore.CYAN}⏳ Waiting 5 seconds before sending follow-ups...")
-    time.sleep(5)
+    # Delay before sending
+    print(f"\n{Fore.CYAN}⏳ Waiting 10 seconds before sending emails...")
+    time.sleep(10)
     
-    # Step 4: Send Follow-Ups
-    success = run_script('follow_up.py', 'STEP 4: Send Follow-Up Emails')
-    results['Follow-Ups'] = success
+    # Step 3: Send today's plan - follow-ups and initial emails share the daily limit
+    success = run_script('send_scheduler.py', 'STEP 3: Send Initial Emails + Follow-Ups')
+    results['Email Sending'] = success
     
     # Summary
     print_header("📊 PIPELINE SUMMARY")
@@ -0,0 +1,399 @@
+"""
+Send Engine - Batched Gmail Sends
+Groups outgoing messages into BatchHttpRequest calls and paces them with a
+token bucket instead of a fixed sleep between every email. Rate limits are
+retried with Retry-After aware backoff; messages that still can't go out
+are parked in the durable retry queue and drained when capacity returns.
+"""
+
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from itertools import islice
+
+import httplib2
+from googleapiclient.errors import HttpError
+from tenacity import (
+    Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+)
+from colorama import Fore
+
+from config_email import EmailConfig
+from message_templates import read_message_id
+
+# Failure kinds
+PERMANENT = "PERMANENT"
+RATE_LIMIT = "RATE_LIMIT"
+TRANSIENT = "TRANSIENT"
+
+# Gmail error reasons that mean "slow down"
+RATE_LIMIT_REASONS = {
+    'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded', 'dailyLimitExceeded'
+}
+
+
+class SendFailure:
+    """Why a send failed. str() gives the text recorded in Send_Status."""
+
+    def __init__(self, kind, message, reason=None, retry_after=None, daily=False):
+        self.kind = kind
+        self.message = message
+        self.reason = reason
+        self.retry_after = retry_after  # Seconds, from the Retry-After header
+        self.daily = daily  # Daily sending limit - no point retrying today
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"SendFailure({self.kind}, {self.message!r})"
+
+    @property
+    def retryable(self):
+        return self.kind in (RATE_LIMIT, TRANSIENT)
+
+
+class RateLimited(Exception):
+    """Raised inside the backoff loop while some messages are rate limited."""
+
+    def __init__(self, failure):
+        super().__init__(str(failure))
+        self.failure = failure
+
+
+def _retry_after_seconds(resp):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    value = resp.get('retry-after') if resp is not None else None
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_send_error(error):
+    """Turn a send exception into a SendFailure."""
+    message = str(error)
+
+    if isinstance(error, HttpError):
+        details = error.error_details if isinstance(error.error_details, list) else []
+        reasons = {d.get('reason') for d in details if isinstance(d, dict)}
+        lower = message.lower()
+
+        if reasons & RATE_LIMIT_REASONS or error.resp.status == 429 or \
+           'quota' in lower or 'rate' in lower:
+            return SendFailure(
+                RATE_LIMIT, message,
+                reason=next(iter(reasons & RATE_LIMIT_REASONS), None),
+                retry_after=_retry_after_seconds(error.resp),
+                daily='dailyLimitExceeded' in reasons or 'daily' in lower
+            )
+
+        if error.resp.status >= 500:
+            return SendFailure(TRANSIENT, message, retry_after=_retry_after_seconds(error.resp))
+
+        return SendFailure(PERMANENT, message)
+
+    # Socket errors, timeouts, dropped connections
+    if isinstance(error, (OSError, httplib2.HttpLib2Error)):
+        return SendFailure(TRANSIENT, message)
+
+    return SendFailure(PERMANENT, message)
+
+
+class TokenBucket:
+    """
+    Paces sends to a per-minute rate. Daily quota comes from `quota`, any
+    object with take(n) -> granted and refund(n) (see quota_ledger).
+    """
+
+    def __init__(self, per_minute, quota, capacity=None):
+        self.rate = per_minute / 60.0  # Tokens per second
+        self.capacity = capacity or max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.quota = quota
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        """Add tokens earned since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, count):
+        """
+        Block until up to `count` tokens are available and take them.
+        Returns the number granted (0 once the daily quota is used up).
+        """
+        # Claim quota first so we never wait on tokens we can't use
+        wanted = self.quota.take(min(count, self.capacity))
+        if wanted == 0:
+            return 0
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= wanted:
+                    self.tokens -= wanted
+                    return wanted
+
+                wait = (wanted - self.tokens) / self.rate
+
+            if wait >= 1:
+                print(f"{Fore.CYAN}  ⏳ Pacing: waiting {wait:.0f} seconds...")
+            time.sleep(wait)
+
+    def refund(self, count):
+        """Return unused daily quota (e.g. for messages that were never sent)."""
+        self.quota.refund(count)
+
+
+class BatchSendEngine:
+    """Sends messages through Gmail in batches paced by a TokenBucket."""
+
+    def __init__(self, service, bucket, batch_size=None,
+                 retry_queue=None, breaker=None, account=None, kind='initial'):
+        self.service = service
+        self.bucket = bucket
+        self.batch_size = batch_size or EmailConfig.SEND_BATCH_SIZE
+        self.retry_queue = retry_queue
+        self.breaker = breaker
+        self.account = account
+        self.kind = kind
+        self.jitter = wait_random_exponential(
+            multiplier=EmailConfig.RETRY_BASE_SECONDS,
+            max=EmailConfig.RETRY_MAX_WAIT_SECONDS
+        )
+
+    def send_batch(self, jobs):
+        """
+        Send a list of (key, message_body) pairs in one batch request.
+        Returns a list of (key, success, result) in the same order, where
+        result is the Gmail response ({'id', 'threadId', ...}) or a SendFailure.
+        """
+        results = {}
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = (True, response)
+            else:
+                results[request_id] = (False, classify_send_error(exception))
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for i, (key, message_body) in enumerate(jobs):
+            batch.add(
+                self.service.users().messages().send(userId='me', body=message_body),
+                request_id=str(i)
+            )
+
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch failed before any callbacks ran
+            error = classify_send_error(e)
+            return [(key, False, error) for key, _ in jobs]
+
+        missing = SendFailure(TRANSIENT, "No response in batch")
+        return [
+            (key, *results.get(str(i), (False, missing)))
+            for i, (key, _) in enumerate(jobs)
+        ]
+
+    def _backoff_wait(self, retry_state):
+        """Jittered exponential backoff, but never sooner than Retry-After."""
+        failure = retry_state.outcome.exception().failure
+        return max(self.jitter(retry_state), failure.retry_after or 0)
+
+    def send_with_backoff(self, jobs):
+        """
+        Send a batch, re-sending rate-limited messages with backoff.
+        Returns the same (key, success, result) list as send_batch.
+        """
+        results = {}
+        remaining = list(jobs)
+
+        def attempt():
+            nonlocal remaining
+            limited = []
+
+            for job, (key, success, result) in zip(remaining, self.send_batch(remaining)):
+                results[key] = (success, result)
+                if not success and result.kind == RATE_LIMIT:
+                    limited.append((job, result))
+
+            if limited:
+                remaining = [job for job, _ in limited]
+                worst = max((failure for _, failure in limited),
+                            key=lambda failure: failure.retry_after or 0)
+                raise RateLimited(worst)
+
+        def report_wait(retry_state):
+            print(f"{Fore.YELLOW}  ⏳ Rate limited ({len(remaining)} messages) - "
+                  f"backing off {retry_state.next_action.sleep:.0f} seconds...")
+
+        try:
+            Retrying(
+                # A daily limit won't clear by waiting a few minutes
+                retry=retry_if_exception(
+                    lambda e: isinstance(e, RateLimited) and not e.failure.daily
+                ),
+                wait=self._backoff_wait,
+                stop=stop_after_attempt(EmailConfig.RETRY_MAX_ATTEMPTS),
+                before_sleep=report_wait,
+                reraise=True
+            )(attempt)
+        except RateLimited:
+            pass  # Leftovers keep their RATE_LIMIT result and get parked
+
+        return [(key, *results[key]) for key, _ in jobs]
+
+    def _park_delay(self, failure, attempts):
+        """Seconds a parked message waits before it is due again."""
+        if failure.daily:
+            return 0  # Due again on the next run
+        if failure.kind == TRANSIENT and self.breaker:
+            return self.breaker.cooldown
+        return max(failure.retry_after or 0, EmailConfig.RETRY_BASE_SECONDS * 2 ** attempts)
+
+    def _due_retries(self, limit, eligible):
+        """
+        Due retry-queue entries, after removing those whose lead can no
+        longer be sent this message (unsubscribed, bounced, replied...).
+        """
+        due = self.retry_queue.due(self.account, self.kind, limit)
+
+        while due and eligible is not None:
+            keep = eligible([key for _, key, _, _ in due])
+            stale = [entry_id for entry_id, key, _, _ in due if key not in keep]
+            if not stale:
+                break
+
+            for entry_id in stale:
+                self.retry_queue.remove(entry_id)
+            print(f"{Fore.YELLOW}  🗑️  Dropped {len(stale)} parked emails to leads no longer eligible")
+
+            # Each pass removes at least one entry, so this ends
+            due = self.retry_queue.due(self.account, self.kind, limit)
+
+        return due
+
+    def _next_chunk(self, granted, jobs, pending, retrying, eligible=None):
+        """Due retry-queue entries first, then fresh jobs, up to `granted`."""
+        chunk = []
+
+        if self.retry_queue is not None:
+            for entry_id, key, message_body, attempts in self._due_retries(granted, eligible):
+                retrying[key] = (entry_id, attempts)
+                chunk.append((key, message_body))
+
+        while pending and len(chunk) < granted:
+            chunk.append(pending.pop(0))
+        chunk.extend(islice(jobs, granted - len(chunk)))
+        return chunk
+
+    def _settle(self, chunk, results, retrying, on_result):
+        """
+        Report a batch's results, parking retryable failures in the retry
+        queue. Returns True if sending should stop (rate limited).
+        """
+        bodies = dict(chunk)
+        rate_limited = False
+
+        for key, success, result in results:
+            entry_id, attempts = retrying.pop(key, (None, 0))
+
+            if success:
+                if entry_id is not None:
+                    self.retry_queue.remove(entry_id)
+                # Keep our Message-ID so follow-ups can reply in the thread
+                result = dict(result, message_id=read_message_id(bodies[key]))
+                on_result(key, success, result)
+                continue
+
+            # Failed sends don't use up the daily quota
+            self.bucket.refund(1)
+            if result.kind == RATE_LIMIT:
+                rate_limited = True
+
+            if result.retryable and self.retry_queue is not None and \
+               attempts < EmailConfig.RETRY_MAX_ATTEMPTS:
+                delay = self._park_delay(result, attempts)
+                if entry_id is None:
+                    self.retry_queue.push(self.account, self.kind, key, bodies[key], delay, result)
+                else:
+                    self.retry_queue.reschedule(entry_id, delay, result)
+
+            elif entry_id is not None:
+                self.retry_queue.remove(entry_id)
+                if result.retryable:
+                    # Out of retries - record it as a real failure
+                    result = SendFailure(PERMANENT, f"Gave up after {attempts} retries: {result}")
+
+            on_result(key, success, result)
+
+        return rate_limited
+
+    def send_all(self, jobs, on_result, eligible=None):
+        """
+        Send any due messages from the retry queue, then every
+        (key, message_body) pair produced by `jobs`.
+        Calls on_result(key, success, result) for each message: result is
+        the Gmail response plus 'message_id' (our Message-ID header) on
+        success, or a SendFailure (retryable if it was parked for a retry).
+        eligible(keys), if given, returns the keys of parked messages that
+        may still be sent; the others are removed from the queue.
+        Returns False if sending stopped on a rate limit or an outage.
+        """
+        jobs = iter(jobs)
+        pending = list(islice(jobs, 1))  # Peek so we never wait on an empty queue
+        retrying = {}  # key -> (retry queue entry id, attempts so far)
+
+        def has_work():
+            if pending:
+                return True
+            return self.retry_queue is not None and \
+                bool(self.retry_queue.due(self.account, self.kind, 1))
+
+        while has_work():
+            if self.breaker and self.breaker.is_open:
+                if self.breaker.trips > EmailConfig.CIRCUIT_MAX_TRIPS:
+                    print(f"{Fore.RED}  ❌ Gmail keeps failing - leaving the rest for the next run.")
+                    return False
+                self.breaker.wait_until_half_open()
+
+            granted = self.bucket.acquire(self.batch_size)
+            if granted == 0:
+                print(f"{Fore.YELLOW}⚠️  Daily send limit reached!")
+                return True
+
+            # Only render as many messages as we have tokens for
+            chunk = self._next_chunk(granted, jobs, pending, retrying, eligible)
+            if len(chunk) < granted:
+                self.bucket.refund(granted - len(chunk))
+            if not chunk:
+                break
+
+            results = self.send_with_backoff(chunk)
+
+            if self.breaker:
+                if all(not success and result.kind == TRANSIENT for _, success, result in results):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+            if self._settle(chunk, results, retrying, on_result):
+                print(f"  {Fore.RED}❌ Rate limit hit! Stopping for today.")
+                return False
+
+            if not pending:
+                pending.extend(islice(jobs, 1))
+
+        return True
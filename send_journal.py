@@ -0,0 +1,90 @@
+"""
+Send Journal - Append-Only Log of Send Results
+Each send result is appended (and fsynced) to a small journal file instead of
+rewriting leads.csv after every email. The journal is replayed on load and
+compacted into leads.csv at the end of a run or when it grows too large.
+"""
+
+import os
+import json
+import pandas as pd
+
+from config_email import EmailConfig, CSVColumns, FilePaths
+
+
+class SendJournal:
+    """Crash-safe journal of per-lead column updates."""
+
+    def __init__(self, path=None, leads_csv=None):
+        self.path = path or FilePaths.SEND_JOURNAL
+        self.leads_csv = leads_csv or FilePaths.LEADS_CSV
+        self.max_bytes = EmailConfig.JOURNAL_COMPACT_SIZE_KB * 1024
+
+    @staticmethod
+    def _email_key(value):
+        """Normalize an email so journal entries can be checked against rows."""
+        if pd.isna(value) or not value:
+            return ''
+        return str(value).lower().strip()
+
+    def record(self, df, idx, updates):
+        """Apply `updates` to row `idx` of df and append them to the journal."""
+        for col, value in updates.items():
+            df.loc[idx, col] = value
+
+        entry = {
+            'row': int(idx),
+            'email': self._email_key(df.loc[idx, CSVColumns.EMAIL]),
+            'updates': updates
+        }
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+            size = f.tell()
+
+        if size >= self.max_bytes:
+            self.compact(df)
+
+    def replay(self, df):
+        """Apply journal entries on top of a freshly loaded DataFrame."""
+        if not os.path.exists(self.path):
+            return df
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash - everything after it is unusable
+                    break
+
+                idx = entry['row']
+                if idx not in df.index:
+                    continue
+
+                # Skip entries whose row no longer holds the same lead
+                if entry.get('email') and \
+                   self._email_key(df.loc[idx, CSVColumns.EMAIL]) != entry['email']:
+                    continue
+
+                for col, value in entry['updates'].items():
+                    df.loc[idx, col] = value
+
+        return df
+
+    def compact(self, df):
+        """Write df to leads.csv atomically and truncate the journal."""
+        tmp_path = self.leads_csv + '.tmp'
+
+        df.to_csv(tmp_path, index=False)
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.leads_csv)
+
+        # Only drop the journal once leads.csv holds everything in it
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
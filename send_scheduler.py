@@ -0,0 +1,319 @@
+"""
+Send Scheduler - One Daily Plan for Initial Emails and Follow-Ups
+Builds a single plan per sending account across first contacts and every
+follow-up stage. Each kind of email gets its SEND_PLAN_WEIGHTS share of the
+account's remaining daily limit, and whatever one kind can't use is carried
+forward to the others. The plan then goes out through one paced sender per
+account, so the day's capacity is used in full without going over it.
+"""
+
+import sys
+from itertools import chain
+
+import pandas as pd
+from colorama import init, Fore
+
+from email_sender import EmailSender
+from follow_up import FollowUpSender, next_followup_number
+from config_email import EmailConfig, CSVColumns, FilePaths, TestConfig
+
+# Initialize colorama
+init(autoreset=True)
+
+
+def plan_capacity(capacity, demand, weights):
+    """
+    Split `capacity` sends between kinds of email.
+    demand maps kind -> sends wanted, weights maps kind -> relative share.
+    Each kind first gets up to its weighted share; capacity left over is
+    then carried forward to kinds that want more, in weights order.
+    Returns {kind: sends}.
+    """
+    order = list(weights) + [kind for kind in demand if kind not in weights]
+    total_weight = sum(weights.values()) or 1
+
+    plan = {
+        kind: min(demand.get(kind, 0), capacity * weights.get(kind, 0) // total_weight)
+        for kind in order
+    }
+
+    left = capacity - sum(plan.values())
+    for kind in order:
+        extra = min(left, demand.get(kind, 0) - plan[kind])
+        plan[kind] += extra
+        left -= extra
+
+    return plan
+
+
+class SendScheduler:
+    """Plans and sends a day's initial emails and follow-ups together."""
+
+    def __init__(self):
+        self.initial = EmailSender()
+        self.followup = FollowUpSender()
+
+        # One pool, ledger, journal and calendar for both kinds of email
+        self.pool = self.initial.pool
+        self.followup.pool = self.pool
+        self.followup.journal = self.initial.journal
+        self.followup.calendar = self.initial.calendar
+        self.journal = self.initial.journal
+
+    def connect(self):
+        """Connect every sending account to Gmail API."""
+        if not self.initial.connect():
+            return False
+        self.followup.service = self.initial.service
+        return True
+
+    def due_followups(self, df):
+        """Leads due for any follow-up today, with a 'number' column, in stage order."""
+        if self.followup.is_weekend():
+            print(f"{Fore.YELLOW}⏸️  Weekend or holiday - no follow-ups today")
+            return df.iloc[0:0].assign(number=0)
+
+        due = self.followup.filter_leads_for_followups(df)
+        leads = pd.concat(
+            [stage_leads.assign(number=number) for number, stage_leads in due.items()]
+        ) if due else df.iloc[0:0].assign(number=0)
+
+        # Follow-ups already parked for a retry go out from the retry queue
+        parked = self.pool.retry_queue.parked_keys('followup')
+        return leads[~leads.index.isin(list(parked))]
+
+    def drop_stale_retries(self, df):
+        """
+        Remove parked messages whose lead should no longer get them, so they
+        neither take a share of today's capacity nor go out when drained.
+        """
+        queue = self.pool.retry_queue
+        for kind, still_wanted in (
+            ('initial', self.initial.still_sendable),
+            ('followup', self.followup.still_due)
+        ):
+            parked = queue.parked_keys(kind)
+            stale = parked - still_wanted(df, list(parked))
+            if stale:
+                queue.discard(kind, stale)
+                print(f"{Fore.YELLOW}🗑️  Dropped {len(stale)} parked {kind} emails to leads no longer eligible")
+
+    def build_plan(self, df):
+        """
+        Today's sends for every connected account, as
+        {account: {'followup': leads, 'initial': leads}}.
+        """
+        weights = EmailConfig.SEND_PLAN_WEIGHTS
+        accounts = [account for account in self.pool.accounts if account.service]
+        capacity = {account: account.remaining_today for account in accounts}
+
+        # Follow-ups go out from the mailbox that first contacted the lead
+        followups = self.due_followups(df)
+        owners = followups[CSVColumns.SENDER_ACCOUNT].fillna('').replace('', self.pool.default.email)
+        followups_for = {account: followups[owners == account.email] for account in accounts}
+
+        stranded = len(followups) - sum(len(leads) for leads in followups_for.values())
+        if stranded:
+            print(f"{Fore.YELLOW}⚠️  {stranded} follow-ups wait for an account that isn't connected")
+
+        # Parked retries go out first and count against their kind's share
+        parked = {
+            account: {kind: self.pool.retry_queue.pending(account.email, kind) for kind in weights}
+            for account in accounts
+        }
+        followup_demand = {
+            account: len(followups_for[account]) + parked[account].get('followup', 0)
+            for account in accounts
+        }
+
+        # New leads can use whatever the follow-ups leave over
+        initial_capacity = {
+            account: max(0, plan_capacity(
+                capacity[account],
+                {'followup': followup_demand[account], 'initial': capacity[account]},
+                weights
+            )['initial'] - parked[account].get('initial', 0))
+            for account in accounts
+        }
+
+        wanted = sum(initial_capacity.values())
+        if TestConfig.TEST_MODE:
+            wanted = min(wanted, TestConfig.TEST_LEAD_LIMIT)
+
+        index = self.initial.index.load(df)
+        index.refresh(df, self.initial.dedup.changed_rows())
+
+        rows = index.take(df, wanted)
+        shards = self.pool.shard(df, rows, initial_capacity)
+
+        # Leads pinned to an unavailable account go back in the queue
+        planned = set(chain.from_iterable(shards.values()))
+        index.restore(df, [row for row in rows if row not in planned])
+
+        # Too few new leads: the rest of their share goes back to follow-ups
+        plan = {}
+        for account in accounts:
+            initial_rows = shards.get(account, [])
+            counts = plan_capacity(
+                capacity[account],
+                {
+                    'followup': followup_demand[account],
+                    'initial': len(initial_rows) + parked[account].get('initial', 0)
+                },
+                weights
+            )
+            new_followups = max(0, counts['followup'] - parked[account].get('followup', 0))
+            plan[account] = {
+                'followup': followups_for[account].iloc[:new_followups],
+                'initial': df.loc[initial_rows]
+            }
+
+        return plan
+
+    def print_plan(self, plan):
+        """Show what each account will send."""
+        print(f"\n{Fore.CYAN}📋 Today's Send Plan:")
+        for account, kinds in plan.items():
+            print(f"  {account.email}: {len(kinds['initial'])} new leads, "
+                  f"{len(kinds['followup'])} follow-ups "
+                  f"({account.emails_sent_today}/{account.max_daily_sends} sent today)")
+
+        parked = self.pool.retry_queue.pending()
+        if parked:
+            print(f"{Fore.CYAN}🔁 {parked} parked emails will be retried first")
+
+    def followup_jobs(self, leads, account):
+        """(idx, message) pairs for an account's follow-ups, stage by stage."""
+        return chain.from_iterable(
+            self.followup.build_jobs(leads[leads['number'] == number], number, account)
+            for number in sorted(leads['number'].unique())
+        )
+
+    def run(self):
+        """Load leads, build today's plan and send it."""
+        df = self.initial.load_leads()
+        if df is None:
+            return
+
+        self.drop_stale_retries(df)
+        plan = self.build_plan(df)
+        self.print_plan(plan)
+
+        planned = sum(len(leads) for kinds in plan.values() for leads in kinds.values())
+        retry_accounts = {
+            kind: self.pool.accounts_with_retries(kind) for kind in EmailConfig.SEND_PLAN_WEIGHTS
+        }
+        if self.followup.is_weekend():
+            retry_accounts['followup'] = []  # Parked follow-ups wait for a working day
+        if planned == 0 and not any(retry_accounts.values()):
+            print(f"\n{Fore.YELLOW}Nothing to send today.")
+            return
+
+        initial_rows = [idx for kinds in plan.values() for idx in kinds['initial'].index]
+
+        if not TestConfig.TEST_MODE:
+            confirm = input(f"{Fore.YELLOW}Continue? (yes/no): ").strip().lower()
+            if confirm != 'yes':
+                print(f"{Fore.YELLOW}Cancelled by user.")
+                self.initial.index.restore(df, initial_rows)
+                self.initial.index.save()
+                return
+
+        counts = {
+            'initial': {'success': 0, 'fail': 0},
+            'followup': {'success': 0, 'fail': 0}
+        }
+        sent_rows = set()
+        followup_numbers = {
+            idx: number
+            for kinds in plan.values()
+            for idx, number in kinds['followup']['number'].items()
+        }
+
+        def record_result(account, kind, idx, success, result):
+            """Per-lead bookkeeping for each send result."""
+            if kind == 'initial':
+                if self.initial.record_result(df, account, idx, success, result, counts['initial']):
+                    sent_rows.add(idx)
+            else:
+                # Retried follow-ups weren't in today's plan
+                number = followup_numbers.get(idx) or next_followup_number(df.loc[idx])
+                self.followup.record_result(df, idx, number, success, result, counts['followup'])
+
+        # Each account sends its kinds in weights order through one paced engine
+        jobs = {}
+        for account, kinds in plan.items():
+            phases = []
+            for kind in EmailConfig.SEND_PLAN_WEIGHTS:
+                if kind == 'initial':
+                    kind_jobs = self.initial.build_jobs(df, kinds['initial'], account, counts['initial'])
+                elif kind == 'followup':
+                    kind_jobs = self.followup_jobs(kinds['followup'], account)
+                else:
+                    continue
+
+                if len(kinds[kind]) or account in retry_accounts[kind]:
+                    phases.append((kind, kind_jobs))
+
+            if phases:
+                jobs[account] = phases
+
+        def eligible(kind, keys):
+            """Parked messages whose lead should still get them (leads change mid-run)."""
+            if kind == 'initial':
+                return self.initial.still_sendable(df, keys)
+            return self.followup.still_due(df, keys)
+
+        try:
+            self.pool.send_plan(jobs, record_result, eligible)
+
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}⚠️  Interrupted by user. Progress saved.")
+
+        # Final save - fold the journal into leads.csv
+        self.journal.compact(df)
+
+        # Leads we didn't get to stay queued for the next run
+        self.initial.index.restore(df, [idx for idx in initial_rows if idx not in sent_rows])
+        self.initial.index.save()
+
+        # Summary
+        print(f"\n{Fore.CYAN}{'='*70}")
+        print(f"{Fore.CYAN}📊 SENDING SUMMARY")
+        print(f"{Fore.CYAN}{'='*70}")
+        print(f"{Fore.GREEN}✅ Initial emails sent: {counts['initial']['success']}")
+        print(f"{Fore.GREEN}✅ Follow-ups sent: {counts['followup']['success']}")
+        print(f"{Fore.RED}❌ Failed: {counts['initial']['fail'] + counts['followup']['fail']}")
+        print(f"{Fore.YELLOW}⏸️  Parked for retry: {self.pool.retry_queue.pending()}")
+        print(f"{Fore.CYAN}📧 Total sent today: {self.pool.emails_sent_today}/{self.pool.max_daily_sends}")
+        print(f"{Fore.GREEN}✅ Progress saved to: {FilePaths.LEADS_CSV}\n")
+
+
+def main():
+    """Main entry point."""
+    print(f"{Fore.CYAN}{'='*70}")
+    print(f"{Fore.CYAN}🗓️  Send Scheduler - Initial Emails + Follow-Ups")
+    print(f"{Fore.CYAN}{'='*70}\n")
+
+    scheduler = SendScheduler()
+
+    # Connect to Gmail
+    if not scheduler.connect():
+        print(f"\n{Fore.RED}❌ Failed to connect to Gmail API")
+        print(f"{Fore.YELLOW}Run: python gmail_auth_helper.py")
+        return
+
+    scheduler.run()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}⚠️  Interrupted by user.")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n{Fore.RED}💥 Fatal error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,170 @@
+"""
+Sendable Index - Persisted Queue of Leads Ready for First Contact
+Keeps the row ids of sendable leads in priority order (Tier, Design_Score,
+lead age) on disk, so picking today's batch pops the best few entries
+instead of re-filtering and re-sorting leads.csv. New rows appended to the
+CSV are pushed onto the heap incrementally on load.
+"""
+
+import os
+import json
+import heapq
+
+import pandas as pd
+
+from config_email import EmailConfig, CSVColumns, FilePaths
+from lead_dedup import DUPLICATE
+
+# Send_Status of leads whose message is parked in the retry queue
+RETRY_PENDING = "Retry Pending"
+
+
+def sendable_mask(df, parked=False):
+    """
+    Boolean mask of leads that should receive an initial email (one pass).
+    With parked=True, leads whose email waits in the retry queue count too.
+    """
+    email = df[CSVColumns.EMAIL]
+
+    mask = (
+        df[CSVColumns.TIER].isin(EmailConfig.SEND_TO_TIERS).to_numpy()
+        & (df[CSVColumns.EMAIL_SENT] != True).to_numpy()
+        & email.notna().to_numpy()
+        & (email != '').to_numpy()
+        & ~df[CSVColumns.STATUS].isin(EmailConfig.SUPPRESSED_STATUSES + [DUPLICATE]).to_numpy()
+    )
+    if not parked:
+        mask &= (df[CSVColumns.SEND_STATUS] != RETRY_PENDING).to_numpy()
+    return mask
+
+
+class SendableIndex:
+    """Min-heap of [tier, score, age, row] for leads that can still be emailed."""
+
+    VERSION = 3
+
+    def __init__(self, path=None):
+        self.path = path or FilePaths.SENDABLE_INDEX
+        self.heap = []
+        self.row_count = 0  # Rows of leads.csv already indexed
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _signature(self):
+        """Config that affects which rows are indexed and their order."""
+        return {
+            'version': self.VERSION,
+            'tiers': list(EmailConfig.SEND_TO_TIERS),
+            'suppressed': list(EmailConfig.SUPPRESSED_STATUSES),
+            'newest_first': EmailConfig.SEND_NEWEST_LEADS_FIRST
+        }
+
+    def _priority(self, df_slice):
+        """Priority keys for a slice of leads as (tier, score, age) columns (lower sends first)."""
+        tier_rank = {tier: rank for rank, tier in enumerate(EmailConfig.SEND_TO_TIERS)}
+        tiers = df_slice[CSVColumns.TIER].map(tier_rank).fillna(len(tier_rank)).astype(int)
+
+        # Low scores are the most outdated sites - the easiest pitch
+        if CSVColumns.DESIGN_SCORE in df_slice.columns:
+            scores = pd.to_numeric(df_slice[CSVColumns.DESIGN_SCORE], errors='coerce')
+            scores = scores.fillna(99).astype(int)
+        else:
+            scores = pd.Series(0, index=df_slice.index)
+
+        # Leads without a timestamp go last within their tier and score
+        if CSVColumns.TIMESTAMP in df_slice.columns:
+            found = pd.to_datetime(df_slice[CSVColumns.TIMESTAMP], errors='coerce')
+            seconds = found.astype('int64') // 10**9
+            ages = -seconds if EmailConfig.SEND_NEWEST_LEADS_FIRST else seconds
+            ages = ages.where(found.notna(), 2**53).astype('int64')
+        else:
+            ages = pd.Series(0, index=df_slice.index)
+
+        return tiers, scores, ages
+
+    def _add_rows(self, df_slice):
+        """Push the sendable rows of a slice of leads onto the heap (O(log n) each)."""
+        sendable = df_slice[sendable_mask(df_slice)]
+        tiers, scores, ages = self._priority(sendable)
+
+        for entry in zip(tiers.tolist(), scores.tolist(), ages.tolist(), sendable.index.tolist()):
+            heapq.heappush(self.heap, list(entry))
+
+    def rebuild(self, df):
+        """Index every row from scratch."""
+        self.heap = []
+        self._add_rows(df)
+        self.row_count = len(df)
+
+    def load(self, df):
+        """Load the persisted index and bring it up to date with df."""
+        state = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    state = json.load(f)
+            except (ValueError, OSError):
+                state = None
+
+        # Rebuild if the index is missing, from other settings, or the CSV shrank
+        if not state or state.get('signature') != self._signature() or \
+           state.get('row_count', 0) > len(df):
+            self.rebuild(df)
+            return self
+
+        self.heap = state['heap']
+        self.row_count = state['row_count']
+
+        # Only rows appended since the last run need to be looked at
+        if len(df) > self.row_count:
+            self._add_rows(df.iloc[self.row_count:])
+            self.row_count = len(df)
+
+        return self
+
+    def refresh(self, df, rows):
+        """Re-index specific rows whose data changed in place."""
+        rows = [row for row in rows if row < self.row_count]
+        if not rows:
+            return
+
+        stale = set(rows)
+        self.heap = [entry for entry in self.heap if entry[-1] not in stale]
+        heapq.heapify(self.heap)
+        self._add_rows(df.loc[rows])
+
+    def take(self, df, count):
+        """
+        Pop up to `count` of the highest-priority rows that are still sendable.
+        Entries that stopped being sendable (sent, unsubscribed) are dropped.
+        """
+        taken = []
+
+        while self.heap and len(taken) < count:
+            # Pop a small batch, then validate it in one vectorized check
+            batch = [heapq.heappop(self.heap) for _ in range(min(count - len(taken), len(self.heap)))]
+            rows = [entry[-1] for entry in batch if entry[-1] in df.index]
+            if not rows:
+                continue
+
+            valid = sendable_mask(df.loc[rows])
+            taken.extend(row for row, ok in zip(rows, valid) if ok)
+
+        return taken
+
+    def restore(self, df, rows):
+        """Put rows that were taken but not sent back into the queue."""
+        if rows:
+            self._add_rows(df.loc[list(rows)])
+
+    def save(self):
+        """Persist the index atomically."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'signature': self._signature(),
+                'row_count': self.row_count,
+                'heap': self.heap
+            }, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,257 @@
+"""
+Sender Pool - Multiple Gmail Accounts with Per-Account Quotas
+Loads one token file per sending account, each with its own daily quota
+(tracked in the shared quota ledger) and rate limit. Leads are sharded across accounts and stay pinned to the
+account that first contacted them, so follow-ups and reply tracking use the
+same mailbox.
+"""
+
+import threading
+
+import pandas as pd
+from colorama import Fore
+
+from gmail_auth_helper import GmailAuthenticator
+from send_engine import BatchSendEngine, TokenBucket
+from quota_ledger import QuotaLedger
+from retry_queue import RetryQueue, CircuitBreaker
+from config_email import EmailConfig, CSVColumns
+
+
+class SenderAccount:
+    """One Gmail mailbox we can send from."""
+
+    def __init__(self, email, token_file, max_daily_sends, sends_per_minute, ledger):
+        self.email = email
+        self.max_daily_sends = max_daily_sends
+        self.sends_per_minute = sends_per_minute
+        self.ledger = ledger
+        self.authenticator = GmailAuthenticator(token_file)
+        self.service = None
+
+    @property
+    def emails_sent_today(self):
+        """Sends of every kind counted against this account today."""
+        return self.ledger.used(self.email)
+
+    @property
+    def remaining_today(self):
+        return max(0, self.max_daily_sends - self.emails_sent_today)
+
+    def reserve(self, kind):
+        """Block reservation against this account's daily limit."""
+        return self.ledger.reserve(self.email, self.max_daily_sends, kind)
+
+    def connect(self):
+        """Connect this account to Gmail API."""
+        try:
+            self.service = self.authenticator.get_service()
+        except Exception as e:
+            print(f"{Fore.RED}❌ {self.email}: {e}")
+            self.service = None
+        return self.service is not None
+
+    def make_engine(self, quota, retry_queue, kind, bucket=None):
+        """
+        Batch engine paced by this account's own rate, drawing from `quota`.
+        Pass the bucket of an earlier engine to keep pacing across kinds.
+        """
+        if bucket is None:
+            bucket = TokenBucket(
+                self.sends_per_minute,
+                quota,
+                capacity=EmailConfig.SEND_BATCH_SIZE
+            )
+        else:
+            bucket.quota = quota
+        return BatchSendEngine(
+            self.service, bucket,
+            retry_queue=retry_queue,
+            breaker=CircuitBreaker(),
+            account=self.email,
+            kind=kind
+        )
+
+
+class SenderPool:
+    """All configured sending accounts."""
+
+    def __init__(self):
+        self.ledger = QuotaLedger()
+        self.retry_queue = RetryQueue()
+        configured = EmailConfig.SENDER_ACCOUNTS or [{
+            'email': EmailConfig.YOUR_EMAIL,
+            'token_file': EmailConfig.TOKEN_FILE
+        }]
+
+        self.accounts = [
+            SenderAccount(
+                email=cfg['email'],
+                token_file=cfg['token_file'],
+                max_daily_sends=cfg.get('max_daily_sends', EmailConfig.MAX_DAILY_SENDS),
+                sends_per_minute=cfg.get('sends_per_minute', EmailConfig.SENDS_PER_MINUTE),
+                ledger=self.ledger
+            )
+            for cfg in configured
+        ]
+        self.lock = threading.Lock()  # Guards lead bookkeeping from worker threads
+
+    @property
+    def default(self):
+        return self.accounts[0]
+
+    @property
+    def emails_sent_today(self):
+        return sum(account.emails_sent_today for account in self.accounts)
+
+    @property
+    def max_daily_sends(self):
+        return sum(account.max_daily_sends for account in self.accounts)
+
+    @property
+    def remaining_today(self):
+        return sum(account.remaining_today for account in self.accounts if account.service)
+
+    def connect(self):
+        """Connect every account; returns True if at least one is usable."""
+        for account in self.accounts:
+            print(f"{Fore.CYAN}🔐 Connecting {account.email}...")
+            if account.connect():
+                print(f"{Fore.GREEN}✅ {account.email} connected")
+            else:
+                print(f"{Fore.RED}❌ {account.email} unavailable - skipping this account")
+
+        return any(account.service for account in self.accounts)
+
+    def get(self, email):
+        """Account with this address, or None if it isn't configured."""
+        for account in self.accounts:
+            if account.email == email:
+                return account
+        return None
+
+    def account_for(self, lead):
+        """Account a lead is pinned to (the default one for unpinned leads)."""
+        pinned = lead.get(CSVColumns.SENDER_ACCOUNT)
+        if pd.notna(pinned) and pinned:
+            return self.get(pinned)
+        return self.default
+
+    def shard(self, df, rows, capacity=None):
+        """
+        Split rows between connected accounts.
+        Pinned leads stay with their account; the rest go to whichever
+        account has the most unassigned capacity left (today's remaining
+        sends, or `capacity` given as {account: sends}).
+        """
+        usable = [account for account in self.accounts if account.service]
+        if capacity is None:
+            capacity = {account.email: account.remaining_today for account in usable}
+        else:
+            capacity = {account.email: capacity.get(account, 0) for account in usable}
+        shards = {account.email: [] for account in usable}
+
+        for row in rows:
+            pinned = df.at[row, CSVColumns.SENDER_ACCOUNT]
+            if pd.notna(pinned) and pinned:
+                if pinned in shards and capacity[pinned] > 0:
+                    shards[pinned].append(row)
+                    capacity[pinned] -= 1
+                continue
+
+            email = max(capacity, key=capacity.get, default=None)
+            if email is None or capacity[email] <= 0:
+                continue
+            shards[email].append(row)
+            capacity[email] -= 1
+
+        return {self.get(email): shard for email, shard in shards.items() if shard}
+
+    def accounts_with_retries(self, kind):
+        """Connected accounts that have parked messages of this kind."""
+        return [account for account in self.accounts
+                if account.service and self.retry_queue.pending(account.email, kind)]
+
+    def send_parallel(self, jobs_by_account, on_result, kind='initial', eligible=None):
+        """
+        Send through every account at once, one worker thread per account.
+        jobs_by_account maps account -> iterable of (key, message_body);
+        on_result(account, key, success, result) runs under the pool lock.
+        Sends are counted in the quota ledger under `kind`, and each account
+        first drains its due messages of that kind from the retry queue,
+        keeping only those whose keys eligible(keys) returns.
+        """
+        return self.send_plan(
+            {account: [(kind, jobs)] for account, jobs in jobs_by_account.items()},
+            lambda account, kind, key, success, result: on_result(account, key, success, result),
+            eligible and (lambda kind, keys: eligible(keys))
+        )
+
+    def send_plan(self, plan, on_result, eligible=None):
+        """
+        Like send_parallel, but each account sends several kinds in turn.
+        plan maps account -> [(kind, jobs), ...]; each kind drains its own
+        retries and is counted under its own kind in the ledger, while one
+        token bucket paces the account throughout.
+        on_result(account, kind, key, success, result) runs under the pool lock,
+        and so does eligible(kind, keys), which picks the parked messages
+        still worth sending.
+        """
+        rate_limited = []
+        stop = threading.Event()
+
+        def until_stopped(jobs):
+            for job in jobs:
+                if stop.is_set():
+                    return
+                yield job
+
+        def locked_result(account, kind):
+            def callback(key, success, result):
+                with self.lock:
+                    on_result(account, kind, key, success, result)
+            return callback
+
+        def locked_eligible(kind):
+            if eligible is None:
+                return None
+
+            def check(keys):
+                with self.lock:
+                    return eligible(kind, keys)
+            return check
+
+        def worker(account, phases):
+            bucket = None
+            for kind, jobs in phases:
+                with account.reserve(kind) as quota:
+                    engine = account.make_engine(quota, self.retry_queue, kind, bucket)
+                    bucket = engine.bucket
+                    if not engine.send_all(until_stopped(jobs), locked_result(account, kind),
+                                           locked_eligible(kind)):
+                        # Rate limited - nothing more from this account this run
+                        rate_limited.append(account.email)
+                        return
+
+        threads = [
+            threading.Thread(target=worker, args=(account, phases), daemon=True)
+            for account, phases in plan.items()
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            # Join with a timeout so Ctrl+C still reaches the main thread
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+
+        except KeyboardInterrupt:
+            # Let in-flight batches finish so their results are recorded
+            stop.set()
+            print(f"\n{Fore.YELLOW}⏳ Finishing in-flight batches...")
+            for thread in threads:
+                thread.join()
+            raise
+
+        return rate_limited
@@ -0,0 +1,28 @@
+"""
+SQLite Store - Base for the Runtime State Kept in SQLite
+The retry queue, quota ledger, follow-up calendar and message cache are each
+one SQLite file shared by worker threads and by the sender, follow-up and
+tracker scripts. Every thread gets its own connection in WAL mode, so
+readers never wait on a writer; connections are autocommit and the stores
+open transactions explicitly where they need them.
+"""
+
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """A SQLite file with one connection per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()  # One SQLite connection per thread
+
+    def _connection(self):
+        """This thread's connection (autocommit; transactions are explicit)."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn